@@ -0,0 +1,287 @@
+# app/analytics.py
+
+import os
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Date, String, cast, delete, func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import CatalogProduct, Order, OrderItem, ProductSalesDaily, SalesDaily, User
+
+# ------------------------------------------------------
+# Configuración de la analítica de ventas
+# ------------------------------------------------------
+# Ids de pedidos por sentencia al aplicar deltas (cada id es un parámetro del IN)
+ANALYTICS_DELTA_CHUNK_SIZE = int(os.getenv("ANALYTICS_DELTA_CHUNK_SIZE", 5000))
+ANALYTICS_MAX_ROWS = int(os.getenv("ANALYTICS_MAX_ROWS", 1000))
+
+UNKNOWN_CATEGORY = "desconocida"
+
+
+class SalesGroupBy(str, Enum):
+    product = "product"
+    category = "category"
+    user = "user"
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+# ------------------------------------------------------
+# Mantenimiento incremental de los agregados
+# ------------------------------------------------------
+# Cada cambio en pedidos se traduce en un delta: las cifras de los pedidos
+# afectados agrupadas por (día, usuario, estado) y (día, producto, usuario,
+# estado), multiplicadas por +1 o -1, y sumadas a las tablas con un
+# INSERT ... SELECT ... ON CONFLICT DO UPDATE. Todo ocurre en la base de datos
+# y dentro de la transacción del cambio, así que los agregados nunca quedan
+# desfasados respecto a los pedidos.
+
+def _additive_upsert(table, select_statement, key_columns: List[str], value_columns: List[str]):
+    stmt = insert(table).from_select(key_columns + value_columns, select_statement)
+    return stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={name: table.c[name] + stmt.excluded[name] for name in value_columns},
+    )
+
+def _delta_statements(condition, sign: int, state: Optional[str] = None) -> list:
+    """
+    Sentencias que suman (sign=1) o restan (sign=-1) a los agregados los pedidos
+    que cumplen condition. Con state se usa ese estado en lugar del actual del
+    pedido (para restar un pedido del estado que tenía antes de un UPDATE).
+    """
+    day = cast(Order.created_at, Date)
+    if state is not None:
+        order_state, state_group = literal(state, String), []
+    else:
+        order_state, state_group = Order.state, [Order.state]
+
+    # Unidades e importe de los items por pedido. El importe del pedido es su
+    # total guardado; en pedidos sin total, la suma de sus items con precio.
+    # El filtro se repite dentro para no agregar todos los items de la tabla.
+    items = (
+        select(
+            OrderItem.order_id.label("order_id"),
+            func.sum(OrderItem.quantity).label("units"),
+            func.sum(func.coalesce(OrderItem.unit_price, 0) * OrderItem.quantity).label("revenue"),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(condition)
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    orders_select = (
+        select(
+            day,
+            Order.user_id,
+            order_state,
+            sign * func.count(Order.id),
+            sign * func.coalesce(func.sum(items.c.units), 0),
+            sign * func.coalesce(func.sum(func.coalesce(Order.total_amount, items.c.revenue, 0)), 0),
+        )
+        .select_from(Order)
+        .outerjoin(items, items.c.order_id == Order.id)
+        .where(condition)
+        .group_by(day, Order.user_id, *state_group)
+    )
+    products_select = (
+        select(
+            day,
+            OrderItem.product_id,
+            Order.user_id,
+            order_state,
+            sign * func.count(func.distinct(Order.id)),
+            sign * func.sum(OrderItem.quantity),
+            sign * func.sum(func.coalesce(OrderItem.unit_price, 0) * OrderItem.quantity),
+        )
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(condition)
+        .group_by(day, OrderItem.product_id, Order.user_id, *state_group)
+    )
+    values = ["orders", "units", "revenue"]
+    return [
+        _additive_upsert(SalesDaily.__table__, orders_select, ["day", "user_id", "state"], values),
+        _additive_upsert(
+            ProductSalesDaily.__table__, products_select, ["day", "product_id", "user_id", "state"], values
+        ),
+    ]
+
+async def apply_orders_delta(
+    session: AsyncSession,
+    order_ids: Sequence[int],
+    sign: int,
+    state: Optional[str] = None,
+) -> None:
+    """
+    Suma o resta los pedidos indicados de los agregados de ventas. No hace
+    commit: debe llamarse en la misma transacción que modifica los pedidos.
+    """
+    order_ids = list(order_ids)
+    for start in range(0, len(order_ids), ANALYTICS_DELTA_CHUNK_SIZE):
+        chunk = order_ids[start:start + ANALYTICS_DELTA_CHUNK_SIZE]
+        for statement in _delta_statements(Order.id.in_(chunk), sign, state):
+            await session.execute(statement)
+
+
+# ------------------------------------------------------
+# Reconstrucción completa
+# ------------------------------------------------------
+def _rebuild_statements(dialect_name: str) -> list:
+    statements = []
+    if dialect_name == "postgresql":
+        # Bloquea altas y cambios de pedidos mientras se recalcula (las lecturas
+        # siguen). SHARE ROW EXCLUSIVE entra en conflicto consigo mismo: dos
+        # reconstrucciones a la vez (otro POST /analytics/rebuild, o el arranque de
+        # varios workers) se serializan; la segunda borra lo que confirmó la
+        # primera en lugar de sumar encima.
+        statements.append(text("LOCK TABLE orders IN SHARE ROW EXCLUSIVE MODE"))
+    statements += [delete(SalesDaily), delete(ProductSalesDaily)]
+    statements += _delta_statements(literal(True), 1)
+    return statements
+
+def rebuild_sales_summaries_sync(conn: Connection) -> None:
+    """
+    Recalcula los agregados desde cero sobre una conexión síncrona (arranque).
+    """
+    for statement in _rebuild_statements(conn.dialect.name):
+        conn.execute(statement)
+
+async def rebuild_sales_summaries(session: AsyncSession) -> int:
+    """
+    Recalcula los agregados desde cero en una transacción. Devuelve el número de
+    filas diarias resultantes.
+    """
+    for statement in _rebuild_statements(session.get_bind().dialect.name):
+        await session.execute(statement)
+    await session.commit()
+    return (await session.execute(select(func.count()).select_from(SalesDaily))).scalar_one()
+
+def sales_summaries_need_backfill(conn: Connection) -> bool:
+    """
+    True si hay pedidos pero los agregados están vacíos (tablas recién creadas).
+    """
+    has_summary = conn.execute(select(literal(1)).select_from(SalesDaily).limit(1)).first()
+    if has_summary:
+        return False
+    return conn.execute(select(literal(1)).select_from(Order).limit(1)).first() is not None
+
+
+# ------------------------------------------------------
+# Consultas
+# ------------------------------------------------------
+def _range_conditions(table, date_from: Optional[date], date_to: Optional[date], state: Optional[str], user_id: Optional[int]) -> list:
+    conditions = []
+    if date_from is not None:
+        conditions.append(table.c.day >= date_from)
+    if date_to is not None:
+        conditions.append(table.c.day <= date_to)
+    if state is not None:
+        conditions.append(table.c.state == state)
+    if user_id is not None:
+        conditions.append(table.c.user_id == user_id)
+    return conditions
+
+def _totals(table):
+    return (
+        func.coalesce(func.sum(table.c.revenue), 0).label("revenue"),
+        func.coalesce(func.sum(table.c.units), 0).label("units"),
+        func.coalesce(func.sum(table.c.orders), 0).label("orders"),
+    )
+
+def _report_statement(group_by: SalesGroupBy, conditions_for, limit: int):
+    """
+    SELECT ... GROUP BY que agrega las filas diarias del rango en los grupos pedidos.
+    """
+    if group_by in (SalesGroupBy.day, SalesGroupBy.week, SalesGroupBy.month):
+        table = SalesDaily.__table__
+        if group_by == SalesGroupBy.day:
+            bucket = table.c.day
+        else:
+            bucket = cast(func.date_trunc(group_by.value, table.c.day), Date)
+        return (
+            select(bucket.label("key"), literal(None, String).label("label"), *_totals(table))
+            .where(*conditions_for(table))
+            .group_by(bucket)
+            .having(func.sum(table.c.orders) > 0)
+            .order_by(bucket)
+            .limit(limit)
+        )
+
+    if group_by == SalesGroupBy.user:
+        table = SalesDaily.__table__
+        statement = (
+            select(table.c.user_id.label("key"), User.username.label("label"), *_totals(table))
+            .select_from(table)
+            .outerjoin(User, User.id == table.c.user_id)
+            .group_by(table.c.user_id, User.username)
+        )
+    elif group_by == SalesGroupBy.product:
+        table = ProductSalesDaily.__table__
+        statement = (
+            select(table.c.product_id.label("key"), CatalogProduct.title.label("label"), *_totals(table))
+            .select_from(table)
+            .outerjoin(CatalogProduct, CatalogProduct.id == table.c.product_id)
+            .group_by(table.c.product_id, CatalogProduct.title)
+        )
+    else:
+        table = ProductSalesDaily.__table__
+        category = func.coalesce(CatalogProduct.category, UNKNOWN_CATEGORY)
+        statement = (
+            select(category.label("key"), literal(None, String).label("label"), *_totals(table))
+            .select_from(table)
+            .outerjoin(CatalogProduct, CatalogProduct.id == table.c.product_id)
+            .group_by(category)
+        )
+    return (
+        statement
+        .where(*conditions_for(table))
+        .having(func.sum(table.c.orders) > 0)
+        .order_by(func.sum(table.c.revenue).desc())
+        .limit(limit)
+    )
+
+async def sales_report(
+    session: AsyncSession,
+    group_by: SalesGroupBy,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    state: Optional[str] = None,
+    user_id: Optional[int] = None,
+    limit: int = ANALYTICS_MAX_ROWS,
+) -> Dict[str, Any]:
+    """
+    Ingresos, unidades y número de pedidos del rango [date_from, date_to]
+    (fechas de creación en UTC) agrupados por producto, categoría, usuario o
+    periodo, más los totales del rango. Se calcula con dos GROUP BY sobre las
+    tablas de agregados, sin tocar los pedidos ni DummyJSON.
+    En la agrupación por categoría, orders es la suma por producto (un pedido
+    con dos productos de la misma categoría cuenta dos veces).
+    """
+    def conditions_for(table):
+        return _range_conditions(table, date_from, date_to, state, user_id)
+
+    rows = (await session.execute(_report_statement(group_by, conditions_for, limit))).all()
+    summary = SalesDaily.__table__
+    totals = (await session.execute(select(*_totals(summary)).where(*conditions_for(summary)))).one()
+    return {
+        "group_by": group_by,
+        "date_from": date_from,
+        "date_to": date_to,
+        "state": state,
+        "totals": {"revenue": float(totals.revenue), "units": int(totals.units), "orders": int(totals.orders)},
+        "rows": [
+            {
+                "key": str(row.key),
+                "label": row.label,
+                "revenue": float(row.revenue),
+                "units": int(row.units),
+                "orders": int(row.orders),
+            }
+            for row in rows
+        ],
+    }
@@ -1,22 +1,27 @@
 # app/auth.py
 
 import os
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from jose import jwt
-import redis
 from fastapi import HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from passlib.context import CryptContext
 
 from app.models import User, Role
-from app.database import get_session
+from app.database import get_async_session
 from app.schemas import TokenPayload
+from app.password_pool import run_hashing, run_hashing_sync
+from app.principal_cache import principal_cache
+from app.redis_client import get_redis
+from app.revocation import publish_revocation, revoked_key, revoked_tokens
 
 # ------------------------------------------------------
-# Configuración de JWT y Redis
+# Configuración de JWT
 # ------------------------------------------------------
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretjwtkey")
 JWT_REFRESH_SECRET_KEY = os.getenv("JWT_REFRESH_SECRET_KEY", "supersecretrefreshkey")
@@ -24,38 +29,66 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+# Coste de bcrypt. Si cambia, los hashes existentes se regeneran en el siguiente login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 
 # ------------------------------------------------------
 # Funciones de hashing de contraseña
+# (bcrypt se ejecuta siempre en el pool dedicado de app.password_pool)
 # ------------------------------------------------------
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return run_hashing_sync(pwd_context.hash, password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await run_hashing(pwd_context.hash, password)
+
+def _hash_rounds(hashed_password: str) -> Optional[int]:
+    # Formato bcrypt: $2b$<rounds>$<salt+hash>
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return pwd_context.needs_update(hashed_password) or _hash_rounds(hashed_password) != BCRYPT_ROUNDS
+
+def _verify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y, si el hash se generó con otro coste, calcula el
+    nuevo en el mismo trabajo del pool. Devuelve (válida, nuevo_hash o None).
+    """
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if password_needs_rehash(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
 
 
 # ------------------------------------------------------
 # CRUD Básico: obtener usuario por username o email, autenticar
 # ------------------------------------------------------
-def get_user_by_username_or_email(session: Session, username_or_email: str) -> Optional[User]:
+async def get_user_by_username_or_email(session: AsyncSession, username_or_email: str) -> Optional[User]:
     statement = select(User).where((User.username == username_or_email) | (User.email == username_or_email))
-    return session.exec(statement).first()
+    return (await session.exec(statement)).first()
 
-def authenticate_user(session: Session, username_or_email: str, password: str) -> Optional[User]:
-    user = get_user_by_username_or_email(session, username_or_email)
+async def authenticate_user(session: AsyncSession, username_or_email: str, password: str) -> Optional[User]:
+    user = await get_user_by_username_or_email(session, username_or_email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await run_hashing(_verify_and_rehash, password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
     return user
 
 
@@ -65,7 +98,7 @@ def authenticate_user(session: Session, username_or_email: str, password: str) -
 def create_access_token(*, subject: str, role: str, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = {}
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire, "sub": subject, "role": role})
+    to_encode.update({"exp": expire, "sub": subject, "role": role, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=ALGORITHM)
 
 def create_refresh_token(*, subject: str) -> str:
@@ -73,33 +106,49 @@ def create_refresh_token(*, subject: str) -> str:
     to_encode = {"exp": expire, "sub": subject}
     return jwt.encode(to_encode, JWT_REFRESH_SECRET_KEY, algorithm=ALGORITHM)
 
-def revoke_token_jwt(token: str):
+async def revoke_token_jwt(token: str):
     """
-    Revoca un access token guardándolo en Redis con TTL igual al tiempo restante.
+    Revoca un access token: guarda su jti en Redis con TTL igual al tiempo
+    restante y lo anuncia al resto de workers. Los tokens antiguos sin jti se
+    siguen revocando guardando el token completo.
     """
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
         exp_timestamp = payload.get("exp")
-        now_ts = datetime.utcnow().timestamp()
-        ttl = int(exp_timestamp - now_ts)
-        if ttl > 0:
-            redis_client.setex(token, ttl, "revoked")
-    except jwt.PyJWTError:
+        jti = payload.get("jti")
+        if jti:
+            await publish_revocation(get_redis(), jti, exp_timestamp)
+        else:
+            ttl = int(exp_timestamp - datetime.utcnow().timestamp())
+            if ttl > 0:
+                await get_redis().setex(token, ttl, "revoked")
+    except jwt.JWTError:
         pass
+    principal_cache.evict_token(token)
 
-def is_token_revoked(token: str) -> bool:
+async def is_token_revoked(token: str, jti: Optional[str] = None) -> bool:
     """
-    Comprueba si un access token ya fue revocado (está en Redis).
+    Comprueba si un access token fue revocado. Con jti y la lista local
+    sincronizada no hay ninguna llamada a Redis.
     """
-    return redis_client.exists(token) == 1
+    if jti:
+        if revoked_tokens.synced:
+            return revoked_tokens.contains(jti)
+        return await get_redis().exists(revoked_key(jti)) == 1
+    return await get_redis().exists(token) == 1
 
 def decode_access_token(token: str) -> TokenPayload:
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
-        return TokenPayload(sub=payload.get("sub"), exp=payload.get("exp"), role=payload.get("role"))
+        return TokenPayload(
+            sub=payload.get("sub"),
+            exp=payload.get("exp"),
+            role=payload.get("role"),
+            jti=payload.get("jti"),
+        )
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expirado")
-    except jwt.PyJWTError:
+    except jwt.JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
 
 def decode_refresh_token(token: str) -> str:
@@ -108,29 +157,37 @@ def decode_refresh_token(token: str) -> str:
         return payload.get("sub")
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expirado")
-    except jwt.PyJWTError:
+    except jwt.JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token inválido")
 
 
 # ------------------------------------------------------
 # Dependencias para FastAPI
 # ------------------------------------------------------
-def get_current_user(
-    session: Session = Depends(get_session),
+async def get_current_user(
+    session: AsyncSession = Depends(get_async_session),
     token: str = Depends(oauth2_scheme)
 ) -> User:
-    if is_token_revoked(token):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revocado")
+    # Token ya validado hace poco: sin Redis, sin decodificar el JWT y sin consultar la base de datos
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
     token_data = decode_access_token(token)
-    user = session.get(User, int(token_data.sub))
+    if await is_token_revoked(token, token_data.jti):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revocado")
+    user = await session.get(User, int(token_data.sub))
     if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no válido o inactivo")
+    # Se desliga de la sesión: la instancia cacheada se comparte entre peticiones y
+    # no debe verse afectada por lo que la ruta haga con su propia sesión.
+    session.expunge(user)
+    principal_cache.put(token, user, token_data.exp, token_data.jti)
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
-def get_current_active_admin(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_admin(current_user: User = Depends(get_current_user)) -> User:
     if current_user.role != Role.admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Se requieren privilegios de administrador")
     return current_user
\ No newline at end of file
@@ -0,0 +1,190 @@
+# app/catalog.py
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import cast, delete, func, or_, text
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import CatalogProduct
+from app.schemas import Product
+
+# Campos por los que se permite ordenar el catálogo local (nombre público -> columna)
+SORTABLE_FIELDS = {
+    "id": CatalogProduct.id,
+    "title": CatalogProduct.title,
+    "price": CatalogProduct.price,
+    "rating": CatalogProduct.rating,
+    "stock": CatalogProduct.stock,
+    "discountPercentage": CatalogProduct.discount_percentage,
+}
+
+# Clave del advisory lock de Postgres que evita sincronizaciones simultáneas entre workers
+CATALOG_SYNC_LOCK_KEY = 7_302_114
+
+_catalog_ready = False
+
+
+# ------------------------------------------------------
+# Conversión entre DummyJSON, modelo y esquema
+# ------------------------------------------------------
+def product_from_row(row: CatalogProduct) -> Product:
+    return Product(
+        id=row.id,
+        title=row.title,
+        description=row.description,
+        price=row.price,
+        discountPercentage=row.discount_percentage,
+        rating=row.rating,
+        stock=row.stock,
+        brand=row.brand or "",
+        category=row.category,
+        thumbnail=row.thumbnail,
+        images=row.images,
+    )
+
+def _row_values(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": data["id"],
+        "title": data.get("title", ""),
+        "description": data.get("description", ""),
+        "price": data.get("price", 0.0),
+        "discount_percentage": data.get("discountPercentage", 0.0),
+        "rating": data.get("rating", 0.0),
+        "stock": data.get("stock", 0),
+        "brand": data.get("brand"),
+        "category": data.get("category", ""),
+        "thumbnail": data.get("thumbnail"),
+        "images": data.get("images"),
+    }
+
+
+# ------------------------------------------------------
+# Lecturas del catálogo local
+# ------------------------------------------------------
+def catalog_is_ready() -> bool:
+    """
+    Indica si el catálogo local ya tiene datos. Una vez que los tiene, se recuerda en memoria.
+    """
+    global _catalog_ready
+    if not _catalog_ready:
+        with Session(engine) as session:
+            _catalog_ready = session.exec(select(CatalogProduct.id).limit(1)).first() is not None
+    return _catalog_ready
+
+def get_catalog_product(product_id: int) -> Optional[Product]:
+    with Session(engine) as session:
+        row = session.get(CatalogProduct, product_id)
+        return product_from_row(row) if row else None
+
+def search_catalog(
+    limit: int = 10,
+    skip: int = 0,
+    sort: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Lista productos del catálogo local con filtros, ordenación y paginación.
+    Devuelve el mismo formato que DummyJSON: { "products", "total", "skip", "limit" }.
+    """
+    conditions = []
+    if category:
+        conditions.append(CatalogProduct.category == category)
+    if min_price is not None:
+        conditions.append(CatalogProduct.price >= min_price)
+    if max_price is not None:
+        conditions.append(CatalogProduct.price <= max_price)
+    if min_rating is not None:
+        conditions.append(CatalogProduct.rating >= min_rating)
+
+    order_by = [CatalogProduct.id]
+    if sort:
+        descending = sort.startswith("-")
+        column = SORTABLE_FIELDS.get(sort.lstrip("-"))
+        if column is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campo de ordenación no válido: {sort}"
+            )
+        order_by = [column.desc() if descending else column.asc(), CatalogProduct.id]
+
+    with Session(engine) as session:
+        total = session.exec(select(func.count()).select_from(CatalogProduct).where(*conditions)).one()
+        statement = select(CatalogProduct).where(*conditions).order_by(*order_by).offset(skip).limit(limit)
+        rows = session.exec(statement).all()
+        products = [product_from_row(row).dict() for row in rows]
+    return {"products": products, "total": total, "skip": skip, "limit": limit}
+
+
+# ------------------------------------------------------
+# Escrituras usadas por la sincronización
+# ------------------------------------------------------
+def upsert_catalog_page(products: List[Dict[str, Any]], synced_at: datetime) -> List[int]:
+    """
+    Inserta o actualiza una página de productos de DummyJSON. Sólo reescribe las filas
+    que han cambiado y devuelve sus IDs.
+    """
+    if not products:
+        return []
+    table = CatalogProduct.__table__
+    values = [dict(_row_values(data), updated_at=synced_at) for data in products]
+    stmt = insert(table).values(values)
+    tracked = [name for name in values[0] if name not in ("id", "updated_at")]
+    changed = [
+        # json no tiene operador de igualdad en Postgres: se compara como jsonb
+        cast(table.c[name], JSONB).is_distinct_from(cast(stmt.excluded[name], JSONB))
+        if name == "images" else table.c[name].is_distinct_from(stmt.excluded[name])
+        for name in tracked
+    ]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={name: stmt.excluded[name] for name in tracked + ["updated_at"]},
+        where=or_(*changed),
+    ).returning(table.c.id)
+    with Session(engine) as session:
+        changed_ids = list(session.execute(stmt).scalars())
+        session.commit()
+    return changed_ids
+
+def delete_missing_products(seen_ids: Iterable[int]) -> List[int]:
+    """
+    Elimina del catálogo local los productos que ya no existen en DummyJSON.
+    """
+    seen = list(seen_ids)
+    if not seen:
+        return []
+    table = CatalogProduct.__table__
+    stmt = delete(table).where(table.c.id.notin_(seen)).returning(table.c.id)
+    with Session(engine) as session:
+        deleted_ids = list(session.execute(stmt).scalars())
+        session.commit()
+    return deleted_ids
+
+def try_acquire_sync_lock() -> Optional[Connection]:
+    """
+    Toma el advisory lock de sincronización. Devuelve la conexión que lo mantiene
+    (hay que pasarla a release_sync_lock) o None si otro worker ya está sincronizando.
+    """
+    conn = engine.connect()
+    acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": CATALOG_SYNC_LOCK_KEY}).scalar()
+    if not acquired:
+        conn.close()
+        return None
+    return conn
+
+def release_sync_lock(conn: Connection) -> None:
+    try:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": CATALOG_SYNC_LOCK_KEY})
+    finally:
+        conn.close()
+
+def mark_catalog_ready() -> None:
+    global _catalog_ready
+    _catalog_ready = True
@@ -1,30 +1,67 @@
 # app/crud_orders.py
 
-from sqlmodel import Session, select
+import os
+from sqlalchemy import func, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException, status
-from typing import List
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+from datetime import datetime
 from app.models import Order, OrderItem, User
-from app.schemas import OrderCreate, OrderItemCreate, OrderRead, OrderItemRead, OrderUpdateState
-from app.utils import fetch_product
-import asyncio
+from app.schemas import OrderCreate, OrderItemCreate, OrderRead, OrderItemRead, OrderUpdateState, OrderBulkStateUpdate, Product
+from app.database import async_engine
+from app.pagination import KeysetPage, DEFAULT_PAGE_SIZE
+from app.utils import resolve_products
+from app.analytics import apply_orders_delta
 
-def create_order(session: Session, user: User, order_in: OrderCreate) -> Order:
-    order = Order(user_id=user.id)
+# Número de pedidos leídos de la base de datos por bloque en las exportaciones en streaming
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 500))
+
+# Los items se cargan con un único SELECT ... WHERE order_id IN (...) por consulta,
+# en lugar de un SELECT perezoso por cada pedido (N+1). Con AsyncSession además es
+# obligatorio: una carga perezosa fuera de await falla.
+ORDER_ITEMS_LOADER = selectinload(Order.items)
+
+# Paginación por clave (created_at, id), del más reciente al más antiguo
+ORDERS_KEYSET = KeysetPage(
+    columns=[Order.created_at, Order.id],
+    key_of=lambda order: [order.created_at.isoformat(), order.id],
+    parse_key=lambda key: (datetime.fromisoformat(key[0]), int(key[1])),
+    descending=True,
+)
+
+async def create_order(session: AsyncSession, user: User, order_in: OrderCreate) -> Order:
+    """
+    Crea el pedido guardando en cada item una copia del producto (título, precio
+    y descuento) y el total del pedido, de modo que leerlo después no requiere
+    consultar DummyJSON. Si algún producto no existe se responde 404 sin crear nada.
+    Los agregados de ventas se actualizan en la misma transacción.
+    """
+    products = await resolve_products(item_in.product_id for item_in in order_in.items)
+    total = sum(products[item_in.product_id].price * item_in.quantity for item_in in order_in.items)
+    order = Order(user_id=user.id, total_amount=total)
     session.add(order)
-    session.flush()  # para obtener order.id antes de commit
+    await session.flush()  # para obtener order.id antes de commit
     for item_in in order_in.items:
+        product = products[item_in.product_id]
         item = OrderItem(
             order_id=order.id,
             product_id=item_in.product_id,
-            quantity=item_in.quantity
+            quantity=item_in.quantity,
+            title=product.title,
+            unit_price=product.price,
+            discount_percentage=product.discountPercentage,
         )
         session.add(item)
-    session.commit()
-    session.refresh(order)
-    return order
+    await session.flush()
+    await apply_orders_delta(session, [order.id], 1)
+    await session.commit()
+    # Recargar con los items (la sesión asíncrona no permite cargarlos de forma perezosa)
+    return await session.get(Order, order.id, options=[ORDER_ITEMS_LOADER], populate_existing=True)
 
-def get_order(session: Session, order_id: int, user: User) -> Order:
-    order = session.get(Order, order_id)
+async def get_order(session: AsyncSession, order_id: int, user: User) -> Order:
+    order = await session.get(Order, order_id, options=[ORDER_ITEMS_LOADER])
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido no encontrado")
     # Si no es admin y el pedido no pertenece al user, prohibir
@@ -32,53 +69,212 @@ def get_order(session: Session, order_id: int, user: User) -> Order:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acceso denegado")
     return order
 
-def get_orders_by_user(session: Session, user: User) -> List[Order]:
-    statement = select(Order).where(Order.user_id == user.id).order_by(Order.created_at.desc())
-    return session.exec(statement).all()
+async def get_orders_by_user_id(session: AsyncSession, user_id: int) -> List[Order]:
+    statement = (
+        select(Order)
+        .where(Order.user_id == user_id)
+        .options(ORDER_ITEMS_LOADER)
+        .order_by(Order.created_at.desc())
+    )
+    return (await session.exec(statement)).all()
+
+async def get_orders_by_user(session: AsyncSession, user: User) -> List[Order]:
+    return await get_orders_by_user_id(session, user.id)
+
+async def get_all_orders(session: AsyncSession) -> List[Order]:
+    statement = select(Order).options(ORDER_ITEMS_LOADER).order_by(Order.created_at.desc())
+    return (await session.exec(statement)).all()
 
-def get_all_orders(session: Session) -> List[Order]:
-    statement = select(Order).order_by(Order.created_at.desc())
-    return session.exec(statement).all()
+async def get_orders_page(
+    session: AsyncSession,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    user_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Devuelve una página de pedidos (opcionalmente de un usuario) con sus cursores:
+    { "items": [Order, ...], "next_cursor": str | None, "prev_cursor": str | None }
+    """
+    statement = select(Order).options(ORDER_ITEMS_LOADER)
+    if user_id is not None:
+        statement = statement.where(Order.user_id == user_id)
+    return await ORDERS_KEYSET.fetch_async(session, statement, cursor, limit)
+
+async def count_orders(session: AsyncSession, user_id: Optional[int] = None) -> int:
+    statement = select(func.count()).select_from(Order)
+    if user_id is not None:
+        statement = statement.where(Order.user_id == user_id)
+    return (await session.exec(statement)).one()
 
-def update_order_state(session: Session, order_id: int, state_in: OrderUpdateState) -> Order:
-    order = session.get(Order, order_id)
+async def iter_order_chunks(
+    session: AsyncSession,
+    user_id: Optional[int] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[Order]]:
+    """
+    Recorre los pedidos (opcionalmente de un usuario) en bloques de chunk_size usando
+    la paginación por clave. Tras cada bloque se vacía la sesión para que la memoria
+    no crezca con el tamaño total del listado.
+    """
+    cursor = None
+    while True:
+        page = await get_orders_page(session, cursor, chunk_size, user_id)
+        if page["items"]:
+            yield page["items"]
+        session.expunge_all()
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+async def update_order_state(session: AsyncSession, order_id: int, state_in: OrderUpdateState) -> Order:
+    # FOR UPDATE: dos cambios simultáneos del mismo pedido se serializan y el
+    # segundo resta de los agregados el estado que dejó el primero
+    order = await session.get(Order, order_id, options=[ORDER_ITEMS_LOADER], with_for_update=True)
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido no encontrado")
-    order.state = state_in.state
-    session.add(order)
-    session.commit()
-    session.refresh(order)
+    if order.state != state_in.state:
+        # Mover el pedido en los agregados de ventas: restarlo con el estado
+        # anterior y sumarlo con el nuevo
+        await apply_orders_delta(session, [order.id], -1)
+        order.state = state_in.state
+        session.add(order)
+        await session.flush()
+        await apply_orders_delta(session, [order.id], 1)
+    await session.commit()
     return order
 
-async def enrich_order(order: Order) -> OrderRead:
+async def bulk_update_order_state(session: AsyncSession, bulk_in: OrderBulkStateUpdate) -> List[int]:
     """
-    Convierte un objeto Order (modelo) en OrderRead, consultando DummyJSON para cada item.
+    Cambia el estado de todos los pedidos que cumplen la lista de ids y/o el filtro
+    con un único UPDATE ... RETURNING, sin cargar los pedidos. Los que ya están en
+    el estado pedido no se tocan. Devuelve los ids actualizados.
+    El UPDATE devuelve además el estado anterior de cada pedido (leído en la
+    misma sentencia), con el que se mueven sus cifras en los agregados de ventas.
     """
-    items_read = []
+    conditions = []
+    if bulk_in.ids is not None:
+        conditions.append(Order.id.in_(bulk_in.ids))
+    if bulk_in.user_id is not None:
+        conditions.append(Order.user_id == bulk_in.user_id)
+    if bulk_in.current_state is not None:
+        conditions.append(Order.state == bulk_in.current_state)
+    if bulk_in.created_after is not None:
+        conditions.append(Order.created_at >= bulk_in.created_after)
+    if bulk_in.created_before is not None:
+        conditions.append(Order.created_at < bulk_in.created_before)
+    if not conditions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indica ids o algún filtro (user_id, current_state, created_after, created_before)"
+        )
+    if bulk_in.ids is not None and not bulk_in.ids:
+        return []
+    # FOR UPDATE: el estado anterior leído es el de las filas que se actualizan
+    # aunque otra transacción las cambie a la vez
+    previous = (
+        select(Order.id, Order.state.label("previous_state"))
+        .where(*conditions, Order.state != bulk_in.state)
+        .with_for_update()
+        .subquery()
+    )
+    statement = (
+        update(Order)
+        .where(Order.id == previous.c.id)
+        .values(state=bulk_in.state)
+        .returning(Order.id, previous.c.previous_state)
+        .execution_options(synchronize_session=False)
+    )
+    updated = (await session.execute(statement)).all()
+    ids_by_previous_state: Dict[str, List[int]] = {}
+    for order_id, previous_state in updated:
+        ids_by_previous_state.setdefault(previous_state, []).append(order_id)
+    for previous_state, ids in ids_by_previous_state.items():
+        await apply_orders_delta(session, ids, -1, state=previous_state)
+    updated_ids = [order_id for order_id, _ in updated]
+    await apply_orders_delta(session, updated_ids, 1)
+    await session.commit()
+    return updated_ids
+
+def order_payload(order: Order, products: Optional[Dict[int, Product]] = None) -> Dict[str, Any]:
+    """
+    Construye el pedido en forma de dict con la estructura de OrderRead, listo
+    para serializar. Los datos de cada item salen de la copia guardada al crear
+    el pedido; el mapa {product_id: Product} sólo se necesita para incluir el
+    producto completo (expand) o para pedidos antiguos sin copia.
+    """
+    products = products or {}
+    items = []
     total = 0.0
-    # Para cada item guardado, pedimos datos de producto a DummyJSON
     for item in order.items:
-        product = await fetch_product(item.product_id)
-        subtotal = product.price * item.quantity
-        total += subtotal
-        items_read.append(OrderItemRead(
-            id=item.id,
-            product=product,
-            quantity=item.quantity
-        ))
-    order_read = OrderRead(
-        id=order.id,
-        user_id=order.user_id,
-        created_at=order.created_at,
-        state=order.state,
-        items=items_read,
-        total_amount=total
-    )
-    return order_read
+        product = products.get(item.product_id)
+        unit_price = item.unit_price if item.unit_price is not None else product.price
+        total += unit_price * item.quantity
+        items.append({
+            "id": item.id,
+            "product_id": item.product_id,
+            "title": item.title if item.title is not None else product.title,
+            "unit_price": unit_price,
+            "discount_percentage": (
+                item.discount_percentage if item.discount_percentage is not None
+                else product.discountPercentage if product is not None else None
+            ),
+            "quantity": item.quantity,
+            "product": product.dict() if product is not None else None,
+        })
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "created_at": order.created_at,
+        "state": order.state,
+        "items": items,
+        "total_amount": order.total_amount if order.total_amount is not None else total,
+    }
+
+def build_order_read(order: Order, products: Optional[Dict[int, Product]] = None) -> OrderRead:
+    return OrderRead.parse_obj(order_payload(order, products))
+
+def _products_to_resolve(orders: Iterable[Order], expand: bool) -> Iterator[int]:
+    # Sin expand sólo hace falta DummyJSON para items sin copia del producto (pedidos antiguos)
+    for order in orders:
+        for item in order.items:
+            if expand or item.unit_price is None or item.title is None:
+                yield item.product_id
+
+async def enrich_order_payload(order: Order, expand: bool = False) -> Dict[str, Any]:
+    """
+    Convierte un objeto Order (modelo) en el dict de respuesta. Sólo consulta
+    DummyJSON si se pide el producto completo (expand) o el pedido no tiene copia de precios.
+    """
+    products = await resolve_products(_products_to_resolve([order], expand))
+    return order_payload(order, products)
+
+async def enrich_orders_payload(orders: List[Order], expand: bool = False) -> List[Dict[str, Any]]:
+    """
+    Igual que enrich_orders_list pero devolviendo dicts listos para serializar
+    (camino rápido de las respuestas de /orders: sin construir ni revalidar modelos).
+    """
+    products = await resolve_products(_products_to_resolve(orders, expand))
+    return [order_payload(order, products) for order in orders]
+
+async def enrich_orders_list(orders: List[Order], expand: bool = False) -> List[OrderRead]:
+    """
+    Dado un listado de Orders, construye los OrderRead desde la base de datos.
+    Si hace falta DummyJSON (expand o pedidos antiguos), resuelve una sola vez
+    cada producto distinto de todo el listado (con concurrencia acotada).
+    """
+    products = await resolve_products(_products_to_resolve(orders, expand))
+    return [build_order_read(order, products) for order in orders]
+
 
-async def enrich_orders_list(orders: List[Order]) -> List[OrderRead]:
+async def iter_enriched_order_chunks(
+    user_id: Optional[int] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[OrderRead]]:
     """
-    Dado un listado de Orders, lanza concurrentemente las enriquecidas.
+    Lee los pedidos por bloques con su propia sesión (sirve para respuestas en
+    streaming y tareas en segundo plano, que sobreviven a get_async_session) y
+    enriquece cada bloque por separado.
     """
-    tasks = [enrich_order(order) for order in orders]
-    return await asyncio.gather(*tasks)
\ No newline at end of file
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        async for orders in iter_order_chunks(session, user_id, chunk_size):
+            yield await enrich_orders_list(orders)
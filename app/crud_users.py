@@ -1,5 +1,7 @@
 # app/crud_users.py
 
+from typing import Any, Dict, Optional
+
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 from fastapi import HTTPException, status
@@ -7,6 +9,14 @@ from fastapi import HTTPException, status
 from app.models import User, Role
 from app.schemas import UserCreate, UserUpdate
 from app.auth import get_password_hash
+from app.principal_cache import principal_cache
+from app.pagination import KeysetPage, DEFAULT_PAGE_SIZE
+
+USERS_KEYSET = KeysetPage(
+    columns=[User.id],
+    key_of=lambda user: [user.id],
+    parse_key=lambda key: (int(key[0]),),
+)
 
 
 def create_user(session: Session, user_in: UserCreate, role: Role = Role.cliente) -> User:
@@ -40,9 +50,11 @@ def get_user(session: Session, user_id: int) -> User:
     return user
 
 
-def get_users(session: Session, skip: int = 0, limit: int = 50) -> list[User]:
-    statement = select(User).offset(skip).limit(limit)
-    return session.exec(statement).all()
+def get_users(session: Session, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Devuelve una página de usuarios ordenados por id con sus cursores next/prev.
+    """
+    return USERS_KEYSET.fetch(session, select(User), cursor, limit)
 
 
 def update_user(session: Session, user_id: int, user_update: UserUpdate) -> User:
@@ -60,6 +72,8 @@ def update_user(session: Session, user_id: int, user_update: UserUpdate) -> User
     session.add(user)
     session.commit()
     session.refresh(user)
+    # Rol, estado o contraseña pueden haber cambiado: descartar sus sesiones cacheadas
+    principal_cache.invalidate_user(user_id)
     return user
 
 
@@ -67,4 +81,5 @@ def delete_user(session: Session, user_id: int):
     user = get_user(session, user_id)
     session.delete(user)
     session.commit()
+    principal_cache.invalidate_user(user_id)
     return {"message": "Usuario eliminado"}
\ No newline at end of file
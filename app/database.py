@@ -1,5 +1,13 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
+import time
+
+from app import metrics
 
 # Leer credenciales de PostgreSQL desde variables de entorno
 DB_USER = os.getenv("DB_USER", "postgres")
@@ -9,13 +17,145 @@ DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "todo_db")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Configuración del pool de conexiones (se aplica a ambos engines)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))       # segundos esperando conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))       # segundos; -1 = no reciclar
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))  # 0 = sin límite
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+
+# ------------------------------------------------------
+# Instrumentación del pool y de las consultas
+# ------------------------------------------------------
+class _CheckoutTimingMixin:
+    """
+    Mide cuánto espera cada checkout por una conexión libre (lo que revela si el
+    pool se queda corto), cuenta los timeouts y actualiza la saturación del pool.
+    """
+    engine_name = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+            capacity = self.size() + max(self._max_overflow, 0)
+            if capacity:
+                metrics.gauge("db_pool_saturation", engine=self.engine_name).set(self.checkedout() / capacity)
+            return connection
+        except PoolTimeoutError:
+            metrics.counter("db_pool_checkout_timeouts_total", engine=self.engine_name).inc()
+            raise
+        finally:
+            metrics.histogram("db_pool_checkout_wait_seconds", engine=self.engine_name).observe(
+                time.perf_counter() - start
+            )
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    engine_name = "sync"
+
+
+class InstrumentedAsyncPool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    engine_name = "async"
+
+
+def _statement_kind(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    kind = words[0].upper() if words else ""
+    return kind if kind in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def instrument_engine(sync_engine, name: str) -> None:
+    """
+    Registra listeners que miden la latencia de cada sentencia (histograma por tipo
+    de sentencia) y cuentan los errores.
+    """
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        metrics.histogram("db_statement_seconds", engine=name, statement=_statement_kind(statement)).observe(elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+        metrics.counter("db_errors_total", engine=name).inc()
+
+
+def pool_status() -> dict:
+    """
+    Estado actual de los pools: conexiones en uso, overflow y saturación (en uso / capacidad).
+    """
+    status = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        capacity = pool.size() + max(DB_MAX_OVERFLOW, 0)
+        checked_out = pool.checkedout()
+        status[name] = {
+            "size": pool.size(),
+            "checked_out": checked_out,
+            "overflow": pool.overflow(),
+            "capacity": capacity,
+            "saturation": checked_out / capacity if capacity else 0.0,
+        }
+    return status
+
+
+_pool_kwargs = dict(
+    echo=DB_ECHO,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 
 # Crear el engine para PostgreSQL
-engine = create_engine(DATABASE_URL, echo=True)
+_sync_connect_args = {}
+if DB_STATEMENT_TIMEOUT_MS > 0:
+    _sync_connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    connect_args=_sync_connect_args,
+    **_pool_kwargs,
+)
+instrument_engine(engine, "sync")
+
+# Engine asíncrono (asyncpg) para los routers async: las esperas a la base de datos
+# no bloquean el event loop.
+_async_connect_args = {}
+if DB_STATEMENT_TIMEOUT_MS > 0:
+    _async_connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=InstrumentedAsyncPool,
+    connect_args=_async_connect_args,
+    **_pool_kwargs,
+)
+instrument_engine(async_engine.sync_engine, "async")
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_async_session():
+    # expire_on_commit=False: tras un commit los objetos siguen siendo legibles
+    # sin volver a consultar (una recarga perezosa no es posible en async)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+async def dispose_async_engine():
+    await async_engine.dispose()
@@ -0,0 +1,278 @@
+# app/export_jobs.py
+
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import async_engine
+from app.schemas import ExportFormat
+from app.crud_orders import count_orders, iter_enriched_order_chunks
+from app.utils import ExportSpool, compact_orders, render_export_file
+from app.render_pool import run_render
+from app.redis_client import get_redis
+
+# ------------------------------------------------------
+# Configuración de los trabajos de exportación
+# ------------------------------------------------------
+# Los trabajos se toman de una cola compartida en Redis, así que cualquier
+# instancia puede generar un fichero que luego se descarga desde otra:
+# EXPORT_JOBS_DIR debe ser un volumen compartido por todas las instancias.
+EXPORT_JOBS_DIR = os.getenv("EXPORT_JOBS_DIR", "exports")
+EXPORT_JOB_HOST = os.getenv("EXPORT_JOB_HOST", socket.gethostname())  # se guarda en el trabajo al generarlo
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", 2))
+EXPORT_JOB_TTL = int(os.getenv("EXPORT_JOB_TTL", 24 * 3600))  # estado en Redis y ficheros en disco
+EXPORT_JOB_MAX_ATTEMPTS = int(os.getenv("EXPORT_JOB_MAX_ATTEMPTS", 3))  # arranques antes de darlo por fallido
+EXPORT_WORKER_HEARTBEAT = float(os.getenv("EXPORT_WORKER_HEARTBEAT", 10))  # segundos
+EXPORT_QUEUE_POLL_TIMEOUT = 1  # segundos de BLMOVE; por debajo de REDIS_SOCKET_TIMEOUT
+EXPORT_JOB_PREFIX = "export_job:"
+
+# Cola compartida en Redis: create_job hace LPUSH y cada worker mueve el trabajo
+# con BLMOVE a la lista "en proceso" de su proceso. Si el proceso muere, su
+# latido caduca y otro proceso devuelve esos trabajos a la cola.
+EXPORT_QUEUE_KEY = "export_jobs:queue"
+EXPORT_PROCESSING_PREFIX = "export_jobs:processing:"
+EXPORT_WORKERS_KEY = "export_jobs:workers"          # set con los procesos registrados
+EXPORT_HEARTBEAT_PREFIX = "export_jobs:heartbeat:"
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.excel: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ExportFormat.pdf: "application/pdf",
+}
+EXTENSIONS = {
+    ExportFormat.csv: "csv",
+    ExportFormat.excel: "xlsx",
+    ExportFormat.pdf: "pdf",
+}
+
+logger = logging.getLogger("tienda_online")
+
+# Identificador de este proceso en la cola (uno por arranque)
+_instance_id = uuid.uuid4().hex
+_workers: List[asyncio.Task] = []
+
+
+def _key(job_id: str) -> str:
+    return f"{EXPORT_JOB_PREFIX}{job_id}"
+
+
+# ------------------------------------------------------
+# Estado de los trabajos (hash en Redis)
+# ------------------------------------------------------
+async def create_job(owner_id: int, export_format: ExportFormat, target_user_id: Optional[int]) -> Dict[str, Any]:
+    """
+    Registra un trabajo en Redis con estado "queued" y lo encola en la cola
+    compartida, de donde lo toma el primer worker libre de cualquier proceso.
+    """
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id,
+        "owner_id": owner_id,
+        "target_user_id": "" if target_user_id is None else target_user_id,
+        "format": export_format.value,
+        "status": "queued",
+        "progress": 0,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    client = get_redis()
+    await client.hset(_key(job_id), mapping=job)
+    await client.expire(_key(job_id), EXPORT_JOB_TTL)
+    await client.lpush(EXPORT_QUEUE_KEY, job_id)
+    return await get_job(job_id)
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    data = await get_redis().hgetall(_key(job_id))
+    if not data:
+        return None
+    data["owner_id"] = int(data["owner_id"])
+    data["target_user_id"] = int(data["target_user_id"]) if data.get("target_user_id") else None
+    data["progress"] = int(data.get("progress", 0))
+    data["total"] = int(data["total"]) if data.get("total") else None
+    return data
+
+async def _update_job(job_id: str, **fields: Any) -> None:
+    await get_redis().hset(_key(job_id), mapping=fields)
+
+def job_file_path(job: Dict[str, Any]) -> str:
+    return os.path.join(EXPORT_JOBS_DIR, f"{job['id']}.{EXTENSIONS[ExportFormat(job['format'])]}")
+
+
+# ------------------------------------------------------
+# Workers
+# ------------------------------------------------------
+def _processing_key(instance_id: Optional[str] = None) -> str:
+    return f"{EXPORT_PROCESSING_PREFIX}{instance_id or _instance_id}"
+
+def _heartbeat_key(instance_id: Optional[str] = None) -> str:
+    return f"{EXPORT_HEARTBEAT_PREFIX}{instance_id or _instance_id}"
+
+async def _beat() -> None:
+    await get_redis().set(_heartbeat_key(), 1, ex=max(int(EXPORT_WORKER_HEARTBEAT * 3), 1))
+
+async def requeue_orphaned_jobs() -> int:
+    """
+    Devuelve a la cola los trabajos en proceso de los procesos cuyo latido ha
+    caducado (caída, despliegue sin parada limpia). Devuelve cuántos ha movido.
+    """
+    client = get_redis()
+    moved = 0
+    for instance_id in await client.smembers(EXPORT_WORKERS_KEY):
+        if instance_id == _instance_id or await client.exists(_heartbeat_key(instance_id)):
+            continue
+        # LMOVE es atómico: si dos procesos recuperan a la vez, cada trabajo se mueve una vez
+        while (job_id := await client.lmove(_processing_key(instance_id), EXPORT_QUEUE_KEY, "RIGHT", "RIGHT")) is not None:
+            moved += 1
+            if await client.exists(_key(job_id)):
+                await _update_job(job_id, status="queued", progress=0)
+            logger.warning(f"Trabajo de exportación {job_id} recuperado del proceso {instance_id}")
+        await client.srem(EXPORT_WORKERS_KEY, instance_id)
+    return moved
+
+async def _heartbeat_loop() -> None:
+    while True:
+        await asyncio.sleep(EXPORT_WORKER_HEARTBEAT)
+        try:
+            await _register()  # idempotente: también registra el proceso si Redis no estaba al arrancar
+        except RedisError as exc:
+            logger.warning(f"Latido de los workers de exportación fallido: {exc}")
+
+async def _register() -> None:
+    await _beat()
+    await get_redis().sadd(EXPORT_WORKERS_KEY, _instance_id)
+    moved = await requeue_orphaned_jobs()
+    if moved:
+        logger.info(f"{moved} trabajos de exportación devueltos a la cola")
+
+async def start_workers(count: int = EXPORT_JOB_WORKERS) -> None:
+    """
+    Arranca los workers. Si Redis no responde la app arranca igualmente: el
+    latido y los workers reintentan hasta que vuelva.
+    """
+    os.makedirs(EXPORT_JOBS_DIR, exist_ok=True)
+    try:
+        await _register()
+    except RedisError as exc:
+        logger.warning(f"Redis no disponible al arrancar los workers de exportación: {exc}")
+    _workers.append(asyncio.create_task(_heartbeat_loop()))
+    for _ in range(count):
+        _workers.append(asyncio.create_task(_worker_loop()))
+
+async def stop_workers() -> None:
+    """
+    Para los workers. Los trabajos a medias vuelven a la cola (ver _worker_loop)
+    y el proceso se da de baja para que nadie intente recuperarlos.
+    """
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    try:
+        client = get_redis()
+        await client.srem(EXPORT_WORKERS_KEY, _instance_id)
+        await client.delete(_heartbeat_key())
+    except RedisError as exc:
+        logger.warning(f"No se pudo dar de baja el proceso en la cola de exportación: {exc}")
+
+async def _requeue(job_id: str) -> None:
+    client = get_redis()
+    await client.lrem(_processing_key(), 1, job_id)
+    await client.rpush(EXPORT_QUEUE_KEY, job_id)  # por la derecha: es el siguiente en salir
+    await _update_job(job_id, status="queued", progress=0)
+
+async def _worker_loop() -> None:
+    client = get_redis()
+    while True:
+        try:
+            job_id = await client.blmove(
+                EXPORT_QUEUE_KEY, _processing_key(), EXPORT_QUEUE_POLL_TIMEOUT, "RIGHT", "LEFT"
+            )
+        except RedisError as exc:
+            logger.warning(f"Cola de exportación no disponible: {exc}")
+            await asyncio.sleep(EXPORT_QUEUE_POLL_TIMEOUT)
+            continue
+        if job_id is None:
+            continue
+        try:
+            await _run_job(job_id)
+        except asyncio.CancelledError:
+            # Parada del proceso: el trabajo vuelve a la cola para otro worker
+            try:
+                await _requeue(job_id)
+            except RedisError:
+                logger.exception(f"No se pudo devolver a la cola el trabajo de exportación {job_id}")
+            raise
+        except Exception as exc:
+            logger.exception(f"Error en el trabajo de exportación {job_id}")
+            error = str(exc)
+        else:
+            error = None
+        try:
+            if error is not None:
+                await _update_job(job_id, status="failed", error=error, finished_at=datetime.utcnow().isoformat())
+            await client.lrem(_processing_key(), 1, job_id)
+        except RedisError as exc:
+            logger.warning(f"No se pudo cerrar el trabajo de exportación {job_id} en Redis: {exc}")
+
+async def _run_job(job_id: str) -> None:
+    job = await get_job(job_id)
+    if job is None:
+        return  # caducó antes de empezar
+    attempts = await get_redis().hincrby(_key(job_id), "attempts", 1)
+    if attempts > EXPORT_JOB_MAX_ATTEMPTS:
+        # Interrumpido en cada intento (p. ej. tumba el proceso): no reintentar más
+        await _update_job(
+            job_id, status="failed", error=f"Interrumpido {EXPORT_JOB_MAX_ATTEMPTS} veces",
+            finished_at=datetime.utcnow().isoformat(),
+        )
+        return
+    export_format = ExportFormat(job["format"])
+    target_user_id = job["target_user_id"]
+
+    async with AsyncSession(async_engine) as session:
+        total = await count_orders(session, target_user_id)
+    await _update_job(job_id, status="running", total=total, host=EXPORT_JOB_HOST)
+
+    # 1. Leer y enriquecer por bloques, guardándolos compactos en un spool en disco
+    spool = ExportSpool(EXPORT_JOBS_DIR)
+    try:
+        async for orders in iter_enriched_order_chunks(target_user_id):
+            spool.write(compact_orders(orders))
+            await _update_job(job_id, progress=spool.count)
+        spool.close()
+
+        # 2. Renderizar el fichero en el pool de procesos
+        path = job_file_path(job)
+        partial_path = f"{path}.part"
+        try:
+            progress = await run_render(render_export_file, export_format.value, spool.path, partial_path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        os.replace(partial_path, path)
+    finally:
+        spool.remove()
+
+    await _update_job(job_id, status="done", progress=progress, finished_at=datetime.utcnow().isoformat())
+    _cleanup_expired_files()
+
+def _cleanup_expired_files() -> None:
+    """
+    Borra del disco los ficheros de trabajos más antiguos que EXPORT_JOB_TTL
+    (su estado en Redis ya ha caducado).
+    """
+    limit = time.time() - EXPORT_JOB_TTL
+    for entry in os.scandir(EXPORT_JOBS_DIR):
+        if entry.is_file() and entry.stat().st_mtime < limit:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
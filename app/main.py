@@ -1,6 +1,7 @@
 # app/main.py
 
 import os
+import asyncio
 import uvicorn
 import logging
 from logging.handlers import RotatingFileHandler
@@ -10,9 +11,16 @@ from starlette.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select, text  # IMPORTA text para ejecutar SQL crudo
 from sqlalchemy.exc import ProgrammingError
 
-from app.database import create_db_and_tables, engine
-from app.models import User, Role
+from app.database import create_db_and_tables, engine, dispose_async_engine
+from app.models import User, Role, Order, OrderItem
 from app.auth import get_password_hash
+from app.utils import init_http_client, close_http_client, catalog_sync_loop, CATALOG_SYNC_ENABLED
+from app import export_jobs
+from app.render_pool import start_render_pool, stop_render_pool
+from app.password_pool import stop_password_pool
+from app.redis_client import init_redis, close_redis, get_redis
+from app.revocation import start_revocation_listener, stop_revocation_listener
+from app.analytics import rebuild_sales_summaries_sync, sales_summaries_need_backfill
 
 # Constantes para el usuario admin por defecto
 DEFAULT_ADMIN_USERNAME = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
@@ -41,7 +49,8 @@ logger.addHandler(file_handler)
 def on_startup():
     """
     1. AÑADE 'cliente' al ENUM 'role' si aún no existe.
-    2. Crea las tablas (si no existen).
+    2. Crea las tablas (si no existen) y añade las columnas e índices nuevos a las existentes.
+       Si los agregados de ventas están vacíos y ya hay pedidos, los calcula.
     3. Inserta un usuario admin por defecto si no existe ninguno.
     """
     # --------------------------------------------------------------
@@ -89,6 +98,42 @@ def on_startup():
     create_db_and_tables()
     logger.info("Tablas de la base de datos creadas (si no existían).")
 
+    # --------------------------------------------------------------
+    # 2b. AÑADIR COLUMNAS NUEVAS A TABLAS YA EXISTENTES
+    # (create_all no altera tablas creadas con una versión anterior)
+    # --------------------------------------------------------------
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE orders ADD COLUMN IF NOT EXISTS total_amount DOUBLE PRECISION"))
+        conn.execute(text("ALTER TABLE orderitems ADD COLUMN IF NOT EXISTS title VARCHAR"))
+        conn.execute(text("ALTER TABLE orderitems ADD COLUMN IF NOT EXISTS unit_price DOUBLE PRECISION"))
+        conn.execute(text("ALTER TABLE orderitems ADD COLUMN IF NOT EXISTS discount_percentage DOUBLE PRECISION"))
+        conn.commit()
+
+    # --------------------------------------------------------------
+    # 2c. CREAR LOS ÍNDICES QUE FALTEN EN TABLAS YA EXISTENTES
+    # CONCURRENTLY no bloquea las escrituras en la tabla mientras se construye
+    # el índice, e IF NOT EXISTS evita el error si otro worker lo crea a la vez.
+    # CONCURRENTLY no puede ir dentro de una transacción: conexión en AUTOCOMMIT
+    # --------------------------------------------------------------
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        quote = conn.dialect.identifier_preparer.quote
+        for table in (Order.__table__, OrderItem.__table__):
+            for index in table.indexes:
+                columns = ", ".join(quote(column.name) for column in index.columns)
+                conn.execute(text(
+                    f"CREATE {'UNIQUE ' if index.unique else ''}INDEX CONCURRENTLY IF NOT EXISTS "
+                    f"{quote(index.name)} ON {quote(table.name)} ({columns})"
+                ))
+
+    # --------------------------------------------------------------
+    # 2d. CALCULAR LOS AGREGADOS DE VENTAS SI LA TABLA ES NUEVA
+    # --------------------------------------------------------------
+    with engine.connect() as conn:
+        if sales_summaries_need_backfill(conn):
+            rebuild_sales_summaries_sync(conn)
+            conn.commit()
+            logger.info("Agregados de ventas calculados a partir de los pedidos existentes.")
+
     # --------------------------------------------------------------
     # 3. COMPROBAR Y CREAR USUARIO ADMIN POR DEFECTO
     # --------------------------------------------------------------
@@ -115,6 +160,100 @@ def on_startup():
             logger.info("Ya existe al menos un usuario con rol ADMIN. No se crea ninguno nuevo.")
 
 
+@app.on_event("startup")
+async def start_http_client():
+    """
+    Crea el cliente HTTP compartido (pool keep-alive) para las llamadas a DummyJSON.
+    """
+    await init_http_client()
+
+
+@app.on_event("startup")
+async def start_redis():
+    """
+    Crea el cliente Redis asíncrono compartido (pool de conexiones con timeouts).
+    """
+    await init_redis()
+
+
+@app.on_event("startup")
+async def start_catalog_sync():
+    """
+    Lanza la sincronización periódica del catálogo local de productos.
+    """
+    if CATALOG_SYNC_ENABLED:
+        app.state.catalog_sync_task = asyncio.create_task(catalog_sync_loop())
+
+
+@app.on_event("shutdown")
+async def stop_catalog_sync():
+    task = getattr(app.state, "catalog_sync_task", None)
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@app.on_event("startup")
+async def start_export_workers():
+    """
+    Arranca el pool de procesos de renderizado y los workers que generan en
+    segundo plano los trabajos de /exports/jobs.
+    """
+    start_render_pool()
+    await export_jobs.start_workers()
+
+
+@app.on_event("shutdown")
+async def stop_export_workers():
+    await export_jobs.stop_workers()
+    stop_render_pool()
+
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    """
+    Carga la lista de tokens revocados y se suscribe a las nuevas revocaciones
+    (pub/sub), para comprobar los tokens sin consultar Redis en cada petición.
+    """
+    await start_revocation_listener(get_redis())
+
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    await stop_revocation_listener()
+
+
+@app.on_event("shutdown")
+async def stop_password_hashing():
+    """
+    Cierra el pool dedicado de hashing de contraseñas.
+    """
+    stop_password_pool()
+
+
+# Los hooks de parada se ejecutan en el orden en que se registran: el cliente
+# HTTP, el engine asíncrono y Redis se cierran después de parar las tareas de
+# fondo (sincronización del catálogo, workers de exportación) que los usan.
+
+@app.on_event("shutdown")
+async def stop_http_client():
+    await close_http_client()
+
+
+@app.on_event("shutdown")
+async def stop_async_engine():
+    await dispose_async_engine()
+
+
+@app.on_event("shutdown")
+async def stop_redis():
+    """
+    Cierra el cliente Redis compartido. Va el último: los hooks anteriores
+    (workers de exportación, revocaciones) aún lo usan al pararse.
+    """
+    await close_redis()
+
+
 # ------------------ CORS ------------------
 origins = ["*"]
 app.add_middleware(
@@ -126,13 +265,15 @@ app.add_middleware(
 )
 
 # ------------------ Inclusión de Routers ------------------
-from app.routers import users, auth, orders, products, exports
+from app.routers import users, auth, orders, products, exports, metrics, analytics
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(products.router)
 app.include_router(orders.router)
 app.include_router(exports.router)
+app.include_router(metrics.router)
+app.include_router(analytics.router)
 
 # ------------------ Ruta Raíz ------------------
 @app.get("/")
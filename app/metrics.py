@@ -0,0 +1,109 @@
+# app/metrics.py
+
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Sequence, Tuple
+
+# Buckets por defecto (segundos) para latencias
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Clave de una métrica: (nombre, ((etiqueta, valor), ...))
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """
+    Histograma acumulativo simple (estilo Prometheus). Seguro entre hilos: los
+    eventos del engine síncrono llegan desde el threadpool.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # el último es +Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets, self.counts):
+                running += count
+                cumulative[str(bound)] = running
+            cumulative["+Inf"] = running + self.counts[-1]
+            return {
+                "count": self.count,
+                "sum": self.total,
+                "max": self.max,
+                "buckets": cumulative,
+            }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def snapshot(self) -> float:
+        return self.value
+
+
+_registry: Dict[MetricKey, Any] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(kind, name: str, labels: Dict[str, str], *args):
+    key = (name, tuple(sorted(labels.items())))
+    metric = _registry.get(key)
+    if metric is None:
+        with _registry_lock:
+            metric = _registry.setdefault(key, kind(*args))
+    return metric
+
+
+def histogram(name: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, **labels: str) -> Histogram:
+    return _get_or_create(Histogram, name, labels, buckets)
+
+
+def counter(name: str, **labels: str) -> Counter:
+    return _get_or_create(Counter, name, labels)
+
+
+def gauge(name: str, **labels: str) -> Gauge:
+    return _get_or_create(Gauge, name, labels)
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    Devuelve todas las métricas registradas agrupadas por nombre:
+    { nombre: [ {"labels": {...}, "value": ...}, ... ] }
+    """
+    result: Dict[str, Any] = {}
+    for (name, labels), metric in sorted(_registry.items(), key=lambda entry: entry[0]):
+        result.setdefault(name, []).append({"labels": dict(labels), "value": metric.snapshot()})
+    return result
@@ -1,7 +1,8 @@
 from typing import Optional, List
+from sqlalchemy import Column, Index, JSON
 from sqlmodel import SQLModel, Field, Relationship
 from enum import Enum
-from datetime import datetime
+from datetime import date, datetime
 
 class Role(str, Enum):
     cliente = "cliente"
@@ -24,11 +25,21 @@ class User(SQLModel, table=True):
 
 class Order(SQLModel, table=True):
     __tablename__ = "orders"
+    # Índices para la paginación por clave (created_at DESC, id DESC):
+    # listado de un usuario y listado global. El de estado sirve al cambio
+    # masivo filtrado por current_state (solo o con rango de fechas)
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_state_created_at", "state", "created_at"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     state: str = Field(default="pendiente")  # posible: pendiente, procesado, enviado
+    # Total calculado al crear el pedido (None en pedidos anteriores a guardar precios)
+    total_amount: Optional[float] = Field(default=None)
 
     owner: Optional[User] = Relationship(back_populates="orders")
     items: List["OrderItem"] = Relationship(back_populates="order")
@@ -38,8 +49,71 @@ class OrderItem(SQLModel, table=True):
     __tablename__ = "orderitems"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="orders.id")
+    order_id: int = Field(foreign_key="orders.id", index=True)  # carga de items con WHERE order_id IN (...)
     product_id: int = Field(nullable=False)  # ID externo en DummyJSON
     quantity: int = Field(default=1)
+    # Copia del producto en el momento de la compra (None en pedidos antiguos)
+    title: Optional[str] = Field(default=None)
+    unit_price: Optional[float] = Field(default=None)
+    discount_percentage: Optional[float] = Field(default=None)
+
+    order: Optional[Order] = Relationship(back_populates="items")
+
+
+class CatalogProduct(SQLModel, table=True):
+    """
+    Copia local del catálogo de DummyJSON, sincronizada periódicamente.
+    """
+    __tablename__ = "catalog_products"
+    __table_args__ = (
+        Index("ix_catalog_products_category_price", "category", "price"),
+        Index("ix_catalog_products_category_rating", "category", "rating"),
+    )
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})  # ID externo en DummyJSON
+    title: str
+    description: str
+    price: float = Field(index=True)
+    discount_percentage: float = Field(default=0.0)
+    rating: float = Field(default=0.0, index=True)
+    stock: int = Field(default=0)
+    brand: Optional[str] = None
+    category: str = Field(index=True)
+    thumbnail: Optional[str] = None
+    images: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# ----- Agregados de ventas (analítica) -----
+# Se mantienen de forma incremental al crear pedidos, cambiar su estado e
+# importarlos (ver app/analytics.py). El estado forma parte de la clave para
+# poder filtrar por él y mover las cifras cuando un pedido cambia de estado.
+
+class SalesDaily(SQLModel, table=True):
+    """
+    Pedidos, unidades e importe por día, usuario y estado.
+    """
+    __tablename__ = "sales_daily"
+
+    day: date = Field(primary_key=True)
+    user_id: int = Field(primary_key=True)
+    state: str = Field(primary_key=True)
+    orders: int = Field(default=0)
+    units: int = Field(default=0)
+    revenue: float = Field(default=0.0)
+
+
+class ProductSalesDaily(SQLModel, table=True):
+    """
+    Pedidos que incluyen el producto, unidades e importe por día, producto, usuario y estado.
+    """
+    __tablename__ = "product_sales_daily"
+
+    day: date = Field(primary_key=True)
+    product_id: int = Field(primary_key=True)
+    user_id: int = Field(primary_key=True)
+    state: str = Field(primary_key=True)
+    orders: int = Field(default=0)
+    units: int = Field(default=0)
+    revenue: float = Field(default=0.0)
 
-    order: Optional[Order] = Relationship(back_populates="items")
\ No newline at end of file
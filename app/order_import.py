@@ -0,0 +1,230 @@
+# app/order_import.py
+
+import os
+import csv
+import codecs
+import json
+import logging
+from datetime import datetime
+from enum import Enum
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.analytics import apply_orders_delta
+from app.models import Order, OrderItem, User
+from app.schemas import OrderImport, OrderImportError, OrderImportResult
+
+# ------------------------------------------------------
+# Configuración de la importación masiva de pedidos
+# ------------------------------------------------------
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))          # pedidos por lote (una transacción)
+IMPORT_MAX_BATCH_SIZE = int(os.getenv("IMPORT_MAX_BATCH_SIZE", 10000))
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", 1000))
+
+logger = logging.getLogger("tienda_online")
+
+
+class ImportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+# (número de línea, pedido validado o mensaje de error)
+ParsedOrder = Tuple[int, Union[OrderImport, str]]
+
+
+# ------------------------------------------------------
+# Lectura y validación en streaming
+# ------------------------------------------------------
+def _validate(data: Dict[str, Any]) -> Union[OrderImport, str]:
+    try:
+        order = OrderImport.parse_obj(data)
+    except ValidationError as exc:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+        )
+    if not order.items:
+        return "El pedido no tiene items"
+    if any(item.quantity <= 0 for item in order.items):
+        return "La cantidad de cada item debe ser mayor que 0"
+    return order
+
+def _parse_ndjson(stream: Iterable[str]) -> Iterator[ParsedOrder]:
+    """
+    Un pedido por línea: {"user_id": 1, "created_at": "...", "state": "...",
+    "items": [{"product_id": 1, "quantity": 2, "unit_price": 9.99, "title": "..."}]}
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield line_number, f"JSON inválido: {exc}"
+            continue
+        if not isinstance(data, dict):
+            yield line_number, "Se esperaba un objeto JSON por línea"
+            continue
+        yield line_number, _validate(data)
+
+def _parse_csv(stream: Iterable[str]) -> Iterator[ParsedOrder]:
+    """
+    Una fila por item con las columnas order_ref, user_id, created_at, state,
+    product_id, quantity, unit_price, title, discount_percentage. Las filas
+    consecutivas con el mismo order_ref forman un pedido; el número de línea
+    reportado es el de su primera fila.
+    """
+    reader = csv.DictReader(stream)
+    missing = [column for column in ("order_ref", "user_id", "product_id", "quantity") if column not in (reader.fieldnames or [])]
+    if missing:
+        yield 1, f"Faltan columnas en la cabecera: {', '.join(missing)}"
+        return
+
+    current_ref: Optional[str] = None
+    current: Optional[Dict[str, Any]] = None
+    first_line = 0
+    for row in reader:
+        ref = row.get("order_ref")
+        if ref != current_ref:
+            if current is not None:
+                yield first_line, _validate(current)
+            current_ref, first_line = ref, reader.line_num
+            current = {
+                "user_id": row.get("user_id"),
+                "created_at": row.get("created_at") or None,
+                "state": row.get("state") or "pendiente",
+                "items": [],
+            }
+        current["items"].append({
+            "product_id": row.get("product_id"),
+            "quantity": row.get("quantity"),
+            "unit_price": row.get("unit_price") or None,
+            "title": row.get("title") or None,
+            "discount_percentage": row.get("discount_percentage") or None,
+        })
+    if current is not None:
+        yield first_line, _validate(current)
+
+def parse_import(file: BinaryIO, import_format: ImportFormat) -> Iterator[ParsedOrder]:
+    # codecs en lugar de io.TextIOWrapper: el fichero de UploadFile es un
+    # SpooledTemporaryFile, que antes de Python 3.11 no tiene readable() y
+    # TextIOWrapper lo rechaza
+    stream = codecs.getreader("utf-8-sig")(file)
+    if import_format == ImportFormat.csv:
+        return _parse_csv(stream)
+    return _parse_ndjson(stream)
+
+
+# ------------------------------------------------------
+# Escritura por lotes
+# ------------------------------------------------------
+def _order_total(order: OrderImport) -> Optional[float]:
+    if order.total_amount is not None:
+        return order.total_amount
+    if all(item.unit_price is not None for item in order.items):
+        return sum(item.unit_price * item.quantity for item in order.items)
+    return None
+
+async def _insert_batch(session: AsyncSession, orders: List[OrderImport]) -> None:
+    """
+    Inserta un lote con dos INSERT multi-fila (pedidos y sus items) en una sola
+    transacción, junto con su suma a los agregados de ventas. Los ids de los
+    pedidos se devuelven en el orden de las filas.
+    """
+    now = datetime.utcnow()
+    result = await session.execute(
+        insert(Order).returning(Order.id, sort_by_parameter_order=True),
+        [
+            {
+                "user_id": order.user_id,
+                "created_at": order.created_at or now,
+                "state": order.state,
+                "total_amount": _order_total(order),
+            }
+            for order in orders
+        ],
+    )
+    order_ids = result.scalars().all()
+    await session.execute(
+        insert(OrderItem),
+        [
+            {
+                "order_id": order_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "title": item.title,
+                "unit_price": item.unit_price,
+                "discount_percentage": item.discount_percentage,
+            }
+            for order_id, order in zip(order_ids, orders)
+            for item in order.items
+        ],
+    )
+    await apply_orders_delta(session, order_ids, 1)
+    await session.commit()
+
+async def _existing_user_ids(session: AsyncSession, user_ids: set) -> set:
+    return set((await session.exec(select(User.id).where(User.id.in_(user_ids)))).all())
+
+
+async def import_orders(
+    session: AsyncSession,
+    file: BinaryIO,
+    import_format: ImportFormat,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> OrderImportResult:
+    """
+    Lee, valida e inserta los pedidos por lotes de batch_size. La lectura y
+    validación de cada lote corre en el threadpool; cada lote es una transacción:
+    si falla se descarta entero, se reporta y se sigue con el siguiente.
+    Las líneas inválidas o con usuarios inexistentes se reportan y se omiten.
+    """
+    parsed = parse_import(file, import_format)
+    inserted = rejected = batches = 0
+    errors: List[OrderImportError] = []
+
+    def report(batch: int, line: Optional[int], error: str) -> None:
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append(OrderImportError(batch=batch, line=line, error=error))
+
+    while True:
+        chunk = await run_in_threadpool(lambda: list(islice(parsed, batch_size)))
+        if not chunk:
+            break
+        batches += 1
+        valid: List[Tuple[int, OrderImport]] = []
+        for line_number, item in chunk:
+            if isinstance(item, str):
+                rejected += 1
+                report(batches, line_number, item)
+            else:
+                valid.append((line_number, item))
+
+        if valid:
+            known_users = await _existing_user_ids(session, {order.user_id for _, order in valid})
+            orders = []
+            for line_number, order in valid:
+                if order.user_id in known_users:
+                    orders.append(order)
+                else:
+                    rejected += 1
+                    report(batches, line_number, f"Usuario {order.user_id} no existe")
+            if orders:
+                try:
+                    await _insert_batch(session, orders)
+                    inserted += len(orders)
+                except SQLAlchemyError as exc:
+                    await session.rollback()
+                    rejected += len(orders)
+                    logger.warning(f"Importación de pedidos: lote {batches} descartado: {exc}")
+                    report(batches, None, f"Lote descartado ({len(orders)} pedidos): {getattr(exc, 'orig', None) or exc}")
+
+    logger.info(f"Importación de pedidos: {inserted} insertados, {rejected} rechazados en {batches} lotes")
+    return OrderImportResult(inserted=inserted, rejected=rejected, batches=batches, errors=errors)
@@ -0,0 +1,109 @@
+# app/pagination.py
+
+import os
+import json
+import base64
+import binascii
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# Tamaño de página por defecto y máximo para los listados paginados
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 50))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 200))
+
+
+# ------------------------------------------------------
+# Cursores opacos
+# ------------------------------------------------------
+def encode_cursor(key: List[Any], direction: str) -> str:
+    """
+    Codifica la clave de la última/primera fila vista y la dirección ("next" o "prev")
+    en un cursor opaco (JSON en base64 url-safe).
+    """
+    raw = json.dumps({"k": key, "d": direction}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[List[Any], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key, direction = data["k"], data["d"]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    if direction not in ("next", "prev") or not isinstance(key, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    return key, direction
+
+
+# ------------------------------------------------------
+# Paginación por clave (keyset)
+# ------------------------------------------------------
+class KeysetPage:
+    """
+    Describe cómo paginar una consulta por clave:
+    - columns: columnas que forman la clave de ordenación (deben identificar la fila de forma única).
+    - key_of: extrae la clave (serializable a JSON) de una fila.
+    - parse_key: convierte la clave del cursor a los tipos de las columnas.
+    - descending: orden natural del listado.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[Any],
+        key_of: Callable[[Any], List[Any]],
+        parse_key: Callable[[List[Any]], Tuple[Any, ...]] = tuple,
+        descending: bool = False,
+    ):
+        self.columns = list(columns)
+        self.key_of = key_of
+        self.parse_key = parse_key
+        self.descending = descending
+
+    def apply(self, statement, cursor: Optional[str], limit: int):
+        """
+        Añade a la consulta el filtro por clave, el ORDER BY y el LIMIT (limit + 1
+        para saber si hay más filas). Devuelve (statement, estado) para finish().
+        """
+        key, direction = decode_cursor(cursor) if cursor else (None, "next")
+        backwards = direction == "prev"
+        # Al retroceder se recorre el índice en sentido contrario y luego se invierte el resultado
+        scan_desc = self.descending != backwards
+        if key is not None:
+            try:
+                values = self.parse_key(key)
+            except (ValueError, TypeError):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+            row_key, cursor_key = tuple_(*self.columns), tuple_(*values)
+            statement = statement.where(row_key < cursor_key if scan_desc else row_key > cursor_key)
+        order_by = [column.desc() if scan_desc else column.asc() for column in self.columns]
+        return statement.order_by(*order_by).limit(limit + 1), (key is not None, backwards, limit)
+
+    def finish(self, rows: Sequence[Any], state: Tuple[bool, bool, int]) -> Dict[str, Any]:
+        """
+        Recorta las filas a la página pedida y calcula los cursores next/prev.
+        """
+        has_cursor, backwards, limit = state
+        rows = list(rows)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+        has_next = has_more if not backwards else has_cursor
+        has_prev = has_cursor if not backwards else has_more
+        return {
+            "items": rows,
+            "next_cursor": encode_cursor(self.key_of(rows[-1]), "next") if rows and has_next else None,
+            "prev_cursor": encode_cursor(self.key_of(rows[0]), "prev") if rows and has_prev else None,
+        }
+
+    def fetch(self, session: Session, statement, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+        statement, state = self.apply(statement, cursor, limit)
+        return self.finish(session.exec(statement).all(), state)
+
+    async def fetch_async(self, session: AsyncSession, statement, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+        statement, state = self.apply(statement, cursor, limit)
+        return self.finish((await session.exec(statement)).all(), state)
@@ -0,0 +1,100 @@
+# app/password_pool.py
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from app import metrics
+
+# ------------------------------------------------------
+# Pool dedicado para el hashing de contraseñas
+# ------------------------------------------------------
+# bcrypt es CPU puro y deliberadamente lento. Ejecutarlo en el threadpool
+# compartido de FastAPI hace que una ráfaga de logins deje sin hilos al resto
+# de rutas síncronas. Aquí corre en un pool propio de tamaño fijo y, si la cola
+# se llena, se rechaza enseguida con 503 en lugar de acumular esperas.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 32))  # trabajos en espera además de los que corren
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))  # segundos (cabecera Retry-After)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, PASSWORD_HASH_WORKERS),
+                thread_name_prefix="password-hash",
+            )
+        return _executor
+
+def stop_password_pool() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _release(_future: Future) -> None:
+    global _pending
+    with _lock:
+        _pending -= 1
+        metrics.gauge("password_hash_pending").set(_pending)
+
+def _timed(func: Callable[..., Any], submitted_at: float, *args: Any) -> Any:
+    metrics.histogram("password_hash_queue_wait_seconds").observe(time.perf_counter() - submitted_at)
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        metrics.histogram("password_hash_seconds").observe(time.perf_counter() - start)
+
+def _submit(func: Callable[..., Any], *args: Any) -> Future:
+    """
+    Encola un trabajo en el pool, o lanza 503 si ya hay PASSWORD_HASH_WORKERS +
+    PASSWORD_HASH_MAX_QUEUE trabajos pendientes.
+    """
+    global _pending
+    executor = _get_executor()
+    with _lock:
+        if _pending >= max(1, PASSWORD_HASH_WORKERS) + max(0, PASSWORD_HASH_MAX_QUEUE):
+            metrics.counter("password_hash_rejected_total").inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio de autenticación saturado, inténtelo de nuevo en unos segundos",
+                headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+            )
+        _pending += 1
+        metrics.gauge("password_hash_pending").set(_pending)
+    try:
+        future = executor.submit(_timed, func, time.perf_counter(), *args)
+    except RuntimeError:
+        # El pool se cerró entre medias (apagado de la app)
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+async def run_hashing(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Ejecuta func en el pool de hashing sin bloquear el event loop.
+    """
+    return await asyncio.wrap_future(_submit(func, *args))
+
+def run_hashing_sync(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Variante para código síncrono (CRUD de usuarios, arranque): espera el
+    resultado, pero el coste de CPU sigue acotado por el pool.
+    """
+    return _submit(func, *args).result()
@@ -0,0 +1,112 @@
+# app/principal_cache.py
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from app.models import User
+
+# ------------------------------------------------------
+# Configuración de la caché de usuarios autenticados
+# ------------------------------------------------------
+# Con varios workers, un cambio de usuario (desactivación, cambio de rol) tarda
+# como mucho PRINCIPAL_CACHE_TTL segundos en verse en los demás procesos; en el
+# proceso que hace el cambio se invalida al momento.
+PRINCIPAL_CACHE_MAX_ITEMS = int(os.getenv("PRINCIPAL_CACHE_MAX_ITEMS", 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 30))  # segundos; 0 = desactivada
+
+
+class _Entry:
+    __slots__ = ("user", "expires_at", "jti")
+
+    def __init__(self, user: User, expires_at: float, jti: Optional[str]):
+        self.user = user
+        self.expires_at = expires_at
+        self.jti = jti
+
+
+class PrincipalCache:
+    """
+    LRU en memoria token -> User ya validado (firma, expiración, revocación y
+    usuario activo), con TTL corto. Mantiene índices user_id -> tokens y
+    jti -> token para poder invalidar todas las sesiones de un usuario cuando
+    cambia, o un token revocado desde otro worker.
+    Los User guardados están desligados de cualquier sesión y son de sólo lectura.
+    get_current_user (asíncrono) la consulta desde el event loop, pero las rutas
+    síncronas de usuarios la invalidan desde el threadpool: por eso usa un lock.
+    """
+
+    def __init__(self, max_items: int = PRINCIPAL_CACHE_MAX_ITEMS, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._token_by_jti: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+            return entry.user
+
+    def put(self, token: str, user: User, token_exp: Optional[float] = None, jti: Optional[str] = None) -> None:
+        """
+        Guarda el usuario hasta que pase el TTL o caduque el token, lo que ocurra antes.
+        """
+        if self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = _Entry(user, expires_at, jti)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            if jti is not None:
+                self._token_by_jti[jti] = token
+            while len(self._entries) > self.max_items:
+                self._remove(next(iter(self._entries)))
+
+    def evict_token(self, token: str) -> None:
+        with self._lock:
+            self._remove(token)
+
+    def evict_jti(self, jti: str) -> None:
+        with self._lock:
+            token = self._token_by_jti.get(jti)
+            if token is not None:
+                self._remove(token)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self._token_by_jti.clear()
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        if entry.jti is not None:
+            self._token_by_jti.pop(entry.jti, None)
+        tokens = self._tokens_by_user.get(entry.user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry.user.id]
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,206 @@
+# app/product_cache.py
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Set
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.schemas import Product
+from app.redis_client import get_redis
+
+# ------------------------------------------------------
+# Configuración de la caché de productos
+# ------------------------------------------------------
+PRODUCT_CACHE_MAX_ITEMS = int(os.getenv("PRODUCT_CACHE_MAX_ITEMS", 2048))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", 300))              # segundos "frescos"
+PRODUCT_CACHE_STALE_TTL = float(os.getenv("PRODUCT_CACHE_STALE_TTL", 3600))  # ventana stale-while-revalidate
+PRODUCT_CACHE_NEGATIVE_TTL = float(os.getenv("PRODUCT_CACHE_NEGATIVE_TTL", 60))  # 404 cacheados
+PRODUCT_CACHE_REDIS = os.getenv("PRODUCT_CACHE_REDIS", "true").lower() in ("1", "true", "yes")
+PRODUCT_CACHE_REDIS_PREFIX = "product:"
+
+logger = logging.getLogger("tienda_online")
+
+# Recibe un product_id y devuelve el Product, o None si el upstream respondió 404
+ProductLoader = Callable[[int], Awaitable[Optional[Product]]]
+
+
+class _Entry:
+    __slots__ = ("product", "fresh_until", "stale_until")
+
+    def __init__(self, product: Optional[Product], fresh_until: float, stale_until: float):
+        self.product = product
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class ProductCache:
+    """
+    Caché de productos en dos niveles:
+    1. LRU acotada en memoria del proceso, con TTL.
+    2. Redis, compartido entre workers.
+    Las entradas caducadas se siguen sirviendo durante la ventana "stale" mientras
+    se refrescan en segundo plano. Los 404 se cachean (entrada con product=None)
+    con un TTL más corto.
+    """
+
+    def __init__(
+        self,
+        max_items: int = PRODUCT_CACHE_MAX_ITEMS,
+        ttl: float = PRODUCT_CACHE_TTL,
+        stale_ttl: float = PRODUCT_CACHE_STALE_TTL,
+        negative_ttl: float = PRODUCT_CACHE_NEGATIVE_TTL,
+        use_redis: bool = PRODUCT_CACHE_REDIS,
+    ):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._refreshing: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    # ---------------------------- API pública ----------------------------
+
+    async def get(self, product_id: int, loader: ProductLoader) -> Optional[Product]:
+        """
+        Devuelve el producto (o None si no existe) consultando memoria, Redis y,
+        en último caso, el loader (upstream).
+        """
+        now = time.time()
+        entry = self._get_local(product_id)
+        if entry is None or now >= entry.stale_until:
+            entry = await self._get_remote(product_id)
+            if entry is not None:
+                self._put_local(product_id, entry)
+
+        if entry is not None:
+            if now < entry.fresh_until:
+                return entry.product
+            if now < entry.stale_until:
+                self._schedule_refresh(product_id, loader)
+                return entry.product
+
+        return await self._load(product_id, loader)
+
+    async def evict(self, product_id: int) -> None:
+        """
+        Elimina un producto de ambos niveles.
+        """
+        self._entries.pop(product_id, None)
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.delete(self._key(product_id))
+        except RedisError as exc:
+            logger.warning(f"No se pudo eliminar el producto {product_id} de Redis: {exc}")
+
+    async def clear(self) -> None:
+        """
+        Vacía la caché completa (memoria y claves product:* en Redis).
+        """
+        self._entries.clear()
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            keys = [key async for key in client.scan_iter(match=f"{PRODUCT_CACHE_REDIS_PREFIX}*", count=500)]
+            if keys:
+                await client.delete(*keys)
+        except RedisError as exc:
+            logger.warning(f"No se pudo vaciar la caché de productos en Redis: {exc}")
+
+    # ---------------------------- Nivel 1: memoria ----------------------------
+
+    def _get_local(self, product_id: int) -> Optional[_Entry]:
+        entry = self._entries.get(product_id)
+        if entry is not None:
+            self._entries.move_to_end(product_id)
+        return entry
+
+    def _put_local(self, product_id: int, entry: _Entry) -> None:
+        self._entries[product_id] = entry
+        self._entries.move_to_end(product_id)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    # ---------------------------- Nivel 2: Redis ----------------------------
+
+    @staticmethod
+    def _key(product_id: int) -> str:
+        return f"{PRODUCT_CACHE_REDIS_PREFIX}{product_id}"
+
+    def _get_redis(self) -> Optional[aioredis.Redis]:
+        if not self.use_redis:
+            return None
+        return get_redis()
+
+    async def _get_remote(self, product_id: int) -> Optional[_Entry]:
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(self._key(product_id))
+        except RedisError as exc:
+            logger.warning(f"Caché Redis no disponible para producto {product_id}: {exc}")
+            return None
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        product = Product(**data["product"]) if data["product"] is not None else None
+        return _Entry(product, data["fresh_until"], data["stale_until"])
+
+    async def _put_remote(self, product_id: int, entry: _Entry) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        ttl = int(entry.stale_until - time.time()) + 1
+        payload = json.dumps({
+            "product": entry.product.dict() if entry.product is not None else None,
+            "fresh_until": entry.fresh_until,
+            "stale_until": entry.stale_until,
+        })
+        try:
+            await client.setex(self._key(product_id), ttl, payload)
+        except RedisError as exc:
+            logger.warning(f"No se pudo guardar el producto {product_id} en Redis: {exc}")
+
+    # ---------------------------- Carga y refresco ----------------------------
+
+    async def _load(self, product_id: int, loader: ProductLoader) -> Optional[Product]:
+        product = await loader(product_id)
+        now = time.time()
+        if product is None:
+            entry = _Entry(None, now + self.negative_ttl, now + self.negative_ttl)
+        else:
+            entry = _Entry(product, now + self.ttl, now + self.ttl + self.stale_ttl)
+        self._put_local(product_id, entry)
+        await self._put_remote(product_id, entry)
+        return product
+
+    def _schedule_refresh(self, product_id: int, loader: ProductLoader) -> None:
+        if product_id in self._refreshing:
+            return
+        self._refreshing.add(product_id)
+        task = asyncio.create_task(self._refresh(product_id, loader))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, product_id: int, loader: ProductLoader) -> None:
+        try:
+            await self._load(product_id, loader)
+        except Exception as exc:
+            # Si el refresco falla seguimos sirviendo la entrada stale hasta que caduque
+            logger.warning(f"Error refrescando producto {product_id} en segundo plano: {exc}")
+        finally:
+            self._refreshing.discard(product_id)
+
+
+product_cache = ProductCache()
@@ -0,0 +1,74 @@
+# app/redis_client.py
+
+import os
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+# ------------------------------------------------------
+# Cliente Redis asíncrono compartido
+# ------------------------------------------------------
+# Un único pool de conexiones por proceso para todo lo que usa Redis
+# (revocación de tokens, caché de productos, trabajos de exportación).
+# Con timeouts explícitos, una latencia alta de Redis produce errores
+# acotados en lugar de bloquear el event loop.
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 2.0))        # espera por una conexión libre
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 2.0))    # lectura/escritura
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 2.0))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))  # segundos
+
+_pool: Optional[aioredis.BlockingConnectionPool] = None
+_client: Optional[aioredis.Redis] = None
+
+
+def _build_client() -> aioredis.Redis:
+    global _pool
+    _pool = aioredis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        decode_responses=True,
+    )
+    return aioredis.Redis(connection_pool=_pool)
+
+
+async def init_redis() -> aioredis.Redis:
+    """
+    Crea el cliente Redis compartido del proceso. Se llama en el arranque de la app.
+    """
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def close_redis() -> None:
+    """
+    Cierra el cliente y desconecta el pool. Se llama al apagar la app.
+    """
+    global _client, _pool
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _pool is not None:
+        await _pool.disconnect()
+        _pool = None
+
+
+def get_redis() -> aioredis.Redis:
+    """
+    Devuelve el cliente compartido; si no se inicializó (scripts, tests), lo crea bajo demanda.
+    """
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
@@ -0,0 +1,55 @@
+# app/render_pool.py
+
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# ------------------------------------------------------
+# Pool de procesos para el renderizado de exportaciones
+# ------------------------------------------------------
+# Los renderers (reportlab, openpyxl, csv) son CPU puro: ejecutarlos en el
+# event loop bloquea todas las peticiones del worker. Se ejecutan en procesos
+# aparte y reciben sólo datos compactos (ver utils.compact_orders).
+EXPORT_RENDER_PROCESSES = int(os.getenv("EXPORT_RENDER_PROCESSES", 2))  # 0 = usar hilos (desarrollo)
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", 4))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def start_render_pool() -> None:
+    global _executor
+    if _executor is None and EXPORT_RENDER_PROCESSES > 0:
+        # spawn: los hijos no heredan el event loop, conexiones ni hilos del proceso padre
+        _executor = ProcessPoolExecutor(
+            max_workers=EXPORT_RENDER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+def stop_render_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, EXPORT_MAX_CONCURRENT))
+    return _semaphore
+
+
+async def run_render(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Ejecuta un renderer en el pool de procesos. Como mucho EXPORT_MAX_CONCURRENT
+    renderizados a la vez por worker; el resto espera turno.
+    """
+    async with _get_semaphore():
+        if _executor is None:
+            return await run_in_threadpool(func, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, func, *args)
@@ -0,0 +1,114 @@
+# app/response_cache.py
+
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+
+from app.redis_client import get_redis
+
+# ------------------------------------------------------
+# Configuración de la caché de respuestas
+# ------------------------------------------------------
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PRODUCTS_RESPONSE_CACHE_TTL = int(os.getenv("PRODUCTS_RESPONSE_CACHE_TTL", 60))  # segundos
+
+logger = logging.getLogger("tienda_online")
+
+
+class ResponseCache:
+    """
+    Caché en Redis de respuestas JSON ya serializadas, compartida entre workers.
+    La clave combina los parámetros normalizados de la petición con un número de
+    versión: invalidar consiste en incrementar la versión (las entradas antiguas
+    dejan de usarse y caducan solas por TTL). Cada entrada guarda su ETag.
+    Si Redis no responde, la petición se sirve sin caché.
+    """
+
+    def __init__(self, prefix: str, ttl: int, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.enabled = enabled
+
+    @staticmethod
+    def normalize_params(params: Dict[str, Any]) -> str:
+        """
+        Parámetros sin valores vacíos, ordenados y con los números en forma canónica
+        (price=10 y price=10.0 comparten entrada).
+        """
+        normalized = {}
+        for name, value in params.items():
+            if value is None:
+                continue
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            normalized[name] = value
+        return json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+    async def get_or_build(
+        self,
+        params: Dict[str, Any],
+        builder: Callable[[], Awaitable[Any]],
+    ) -> Tuple[bytes, str]:
+        """
+        Devuelve (cuerpo JSON, ETag) desde Redis o, si no está, lo construye con
+        builder() y lo guarda con TTL.
+        """
+        key = None
+        if self.enabled:
+            try:
+                key = await self._key(params)
+                cached = await get_redis().get(key)
+                if cached is not None:
+                    entry = json.loads(cached)
+                    return entry["body"].encode("utf-8"), entry["etag"]
+            except RedisError as exc:
+                logger.warning(f"Caché de respuestas no disponible ({self.prefix}): {exc}")
+                key = None
+
+        body = json.dumps(jsonable_encoder(await builder()), separators=(",", ":"))
+        etag = f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()}"'
+        if key is not None:
+            try:
+                await get_redis().setex(key, self.ttl, json.dumps({"etag": etag, "body": body}))
+            except RedisError as exc:
+                logger.warning(f"No se pudo guardar la respuesta en caché ({self.prefix}): {exc}")
+        return body.encode("utf-8"), etag
+
+    async def invalidate(self) -> None:
+        if not self.enabled:
+            return
+        try:
+            await get_redis().incr(self._version_key())
+        except RedisError as exc:
+            logger.warning(f"No se pudo invalidar la caché de respuestas ({self.prefix}): {exc}")
+
+    def _version_key(self) -> str:
+        return f"{self.prefix}:version"
+
+    async def _key(self, params: Dict[str, Any]) -> str:
+        version = await get_redis().get(self._version_key()) or "0"
+        digest = hashlib.sha1(self.normalize_params(params).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{version}:{digest}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 7232): W/"x" equivale a "x"
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+products_listing_cache = ResponseCache("response:products", PRODUCTS_RESPONSE_CACHE_TTL)
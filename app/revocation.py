@@ -0,0 +1,177 @@
+# app/revocation.py
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.principal_cache import principal_cache
+
+# ------------------------------------------------------
+# Revocación de tokens por jti
+# ------------------------------------------------------
+# Cada token revocado se guarda en Redis como revoked:jti:<jti> (TTL = vida
+# restante del token) y se anuncia por pub/sub. Cada worker mantiene una copia
+# local del conjunto, cargada al arrancar y actualizada con los mensajes, de
+# modo que comprobar un token no necesita ninguna llamada de red. Mientras la
+# copia local no está sincronizada se consulta Redis directamente.
+REVOKED_JTI_PREFIX = "revoked:jti:"
+REVOCATION_CHANNEL = "auth:revocations"
+REVOCATION_RESYNC_DELAY = 1.0  # segundos entre reintentos tras perder la conexión
+
+logger = logging.getLogger("tienda_online")
+
+
+def revoked_key(jti: str) -> str:
+    return f"{REVOKED_JTI_PREFIX}{jti}"
+
+
+class RevocationSet:
+    """
+    Conjunto local jti -> expiración (timestamp). Los jti caducados se purgan
+    de forma perezosa: un token caducado ya es rechazado por el decode del JWT.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_purge = time.time()
+        self.synced = False
+
+    def add(self, jti: str, exp: float) -> None:
+        with self._lock:
+            self._entries[jti] = exp
+        principal_cache.evict_jti(jti)
+
+    def contains(self, jti: str) -> bool:
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge > 60:
+                self._purge(now)
+            exp = self._entries.get(jti)
+            return exp is not None and exp > now
+
+    def replace(self, entries: Dict[str, float]) -> None:
+        with self._lock:
+            self._entries = dict(entries)
+        for jti in entries:
+            principal_cache.evict_jti(jti)
+
+    def _purge(self, now: float) -> None:
+        self._entries = {jti: exp for jti, exp in self._entries.items() if exp > now}
+        self._last_purge = now
+
+
+revoked_tokens = RevocationSet()
+
+
+# ------------------------------------------------------
+# Publicación y sincronización
+# ------------------------------------------------------
+async def publish_revocation(client: aioredis.Redis, jti: str, exp: float) -> None:
+    ttl = int(exp - time.time())
+    if ttl <= 0:
+        return
+    await client.setex(revoked_key(jti), ttl, "revoked")
+    await client.publish(REVOCATION_CHANNEL, json.dumps({"jti": jti, "exp": exp}))
+    revoked_tokens.add(jti, exp)
+
+async def _seed(client: aioredis.Redis) -> None:
+    """
+    Carga desde Redis todos los jti revocados que siguen vigentes.
+    """
+    now = time.time()
+    entries: Dict[str, float] = {}
+    async for key in client.scan_iter(match=f"{REVOKED_JTI_PREFIX}*", count=1000):
+        ttl = await client.ttl(key)
+        if ttl and ttl > 0:
+            entries[key[len(REVOKED_JTI_PREFIX):]] = now + ttl
+    revoked_tokens.replace(entries)
+    revoked_tokens.synced = True
+
+def _handle_message(message: dict) -> None:
+    try:
+        data = json.loads(message["data"])
+        revoked_tokens.add(data["jti"], float(data["exp"]))
+    except (ValueError, KeyError, TypeError):
+        logger.warning(f"Mensaje de revocación inválido: {message.get('data')!r}")
+
+
+class RevocationListener:
+    """
+    Suscripción al canal de revocaciones en una task del event loop.
+    Si la conexión se pierde, se vuelve a consultar Redis por petición hasta que
+    la suscripción se restablece y el conjunto local se recarga.
+    """
+
+    def __init__(self, client: aioredis.Redis):
+        self.client = client
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        # Suscribirse antes de cargar: ninguna revocación se pierde entre ambos pasos
+        await self._pubsub.subscribe(REVOCATION_CHANNEL)
+        await _seed(self.client)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        revoked_tokens.synced = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    _handle_message(message)
+            except (RedisError, OSError) as exc:
+                logger.warning(f"Suscripción de revocaciones interrumpida: {exc}")
+                revoked_tokens.synced = False
+                await self._resync()
+
+    async def _resync(self) -> None:
+        while True:
+            await asyncio.sleep(REVOCATION_RESYNC_DELAY)
+            try:
+                # El pubsub se vuelve a suscribir solo al reconectar; se recarga el conjunto
+                # para recuperar las revocaciones publicadas mientras estaba desconectado.
+                await self._pubsub.ping()
+                await _seed(self.client)
+                logger.info("Suscripción de revocaciones restablecida")
+                return
+            except (RedisError, OSError):
+                continue
+
+
+_listener: Optional[RevocationListener] = None
+
+async def start_revocation_listener(client: aioredis.Redis) -> None:
+    global _listener
+    if _listener is None:
+        _listener = RevocationListener(client)
+        try:
+            await _listener.start()
+        except (RedisError, OSError) as exc:
+            # Sin Redis al arrancar: se sigue funcionando con consultas por petición
+            logger.warning(f"No se pudo sincronizar la lista de revocaciones: {exc}")
+            await _listener.stop()
+            _listener = None
+
+async def stop_revocation_listener() -> None:
+    global _listener
+    if _listener is not None:
+        await _listener.stop()
+        _listener = None
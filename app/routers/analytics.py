@@ -0,0 +1,43 @@
+# app/routers/analytics.py
+
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.analytics import ANALYTICS_MAX_ROWS, SalesGroupBy, rebuild_sales_summaries, sales_report
+from app.auth import get_current_active_admin
+from app.database import get_async_session
+from app.schemas import SalesRebuildResult, SalesReport
+
+router = APIRouter(prefix="/analytics", tags=["analytics"], dependencies=[Depends(get_current_active_admin)])
+
+
+@router.get("/sales", response_model=SalesReport)
+async def read_sales(
+    group_by: SalesGroupBy = Query(SalesGroupBy.day),
+    date_from: Optional[date] = Query(None, description="Primer día incluido (UTC)"),
+    date_to: Optional[date] = Query(None, description="Último día incluido (UTC)"),
+    state: Optional[str] = Query(None, description="Sólo pedidos en este estado"),
+    user_id: Optional[int] = Query(None),
+    limit: int = Query(100, ge=1, le=ANALYTICS_MAX_ROWS),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    (Admin) Ingresos, unidades y pedidos por producto, categoría, usuario o
+    periodo (day, week, month) en un rango de fechas, con los totales del rango.
+    Se sirve desde los agregados diarios que se actualizan con cada pedido.
+    """
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from debe ser anterior a date_to")
+    return await sales_report(session, group_by, date_from, date_to, state, user_id, limit)
+
+
+@router.post("/rebuild", response_model=SalesRebuildResult)
+async def rebuild_sales(session: AsyncSession = Depends(get_async_session)):
+    """
+    (Admin) Recalcula los agregados de ventas desde los pedidos (p. ej. tras
+    cargar pedidos directamente en la base de datos).
+    """
+    return {"rows": await rebuild_sales_summaries(session)}
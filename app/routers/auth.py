@@ -2,10 +2,10 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import timedelta
 
-from app.database import get_session
+from app.database import get_async_session
 from app.auth import (
     authenticate_user,
     create_access_token,
@@ -20,14 +20,16 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
-    Endpoint de login: genera access token y refresh token
+    Endpoint de login: genera access token y refresh token.
+    La verificación de la contraseña corre en el pool de hashing; si está
+    saturado se responde 503 sin afectar al resto de rutas.
     """
-    user = authenticate_user(session, form_data.username, form_data.password)
+    user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
     access_token_expires = timedelta(minutes=15)
@@ -52,11 +54,11 @@ def refresh_access_token(token_in: TokenRefresh):
 
 
 @router.post("/logout")
-def logout(
+async def logout(
     token: str = Depends(oauth2_scheme),  # <- aquí usamos oauth2_scheme
 ):
     """
     Revoca el access token actual (se pasa como Bearer)
     """
-    revoke_token_jwt(token)
+    await revoke_token_jwt(token)
     return {"msg": "Sesión cerrada correctamente"}
\ No newline at end of file
@@ -1,23 +1,45 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException, status, Response
-from typing import List
-from sqlmodel import Session, select
-from app.schemas import ExportRequest, ExportFormat, OrderRead
-from app.database import get_session
-from app.models import Order
-from app.crud_orders import get_all_orders, get_orders_by_user, enrich_orders_list
+from fastapi.responses import FileResponse, StreamingResponse
+from redis.exceptions import RedisError
+from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.schemas import ExportRequest, ExportFormat, ExportJobRead, OrderRead
+from app import export_jobs
+from app.database import get_async_session
+from app.crud_orders import get_all_orders, get_orders_by_user_id, iter_enriched_order_chunks, enrich_orders_list
 from app.auth import get_current_active_user, get_current_active_admin
-from app.utils import export_orders_to_csv, export_orders_to_excel, export_orders_to_pdf
+from app.utils import (
+    compact_orders,
+    render_export,
+    render_export_spool,
+    spool_order_chunks,
+    stream_orders_csv,
+)
+from app.render_pool import run_render
 import asyncio
 from datetime import datetime
 
 router = APIRouter(prefix="/exports", tags=["exports"])
 
+
+def _export_target_user_id(export_req: ExportRequest, current_user) -> Optional[int]:
+    """
+    Usuario cuyos pedidos se exportan (None = todos):
+    - Si el usuario es cliente, sólo sus pedidos.
+    - Si es admin, los del user_id indicado o todos si no se indica.
+    """
+    if current_user.role == "admin":
+        return export_req.user_id or None
+    return current_user.id
+
+
 @router.post("/", summary="Exportar pedidos", responses={
     200: {"content": {"application/octet-stream": {}}},
 })
 async def export_orders(
     export_req: ExportRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user=Depends(get_current_active_user)
 ):
     """
@@ -25,39 +47,136 @@ async def export_orders(
     - Si el usuario es cliente, sólo se exportan sus pedidos.
     - Si es admin y no se pasa user_id, se exportan todos.
     - Si es admin y pasa user_id, se exportan sólo de ese usuario.
+    - Con stream=true (CSV y Excel) los pedidos se leen y enriquecen por bloques;
+      en CSV las filas se envían según se generan y en Excel se vuelcan a un libro
+      write-only que se envía al terminar.
     """
+    target_user_id = _export_target_user_id(export_req, current_user)
+
+    if export_req.stream:
+        if export_req.format == ExportFormat.csv:
+            filename = f"orders_{datetime.utcnow().isoformat()}.csv"
+            return StreamingResponse(
+                stream_orders_csv(iter_enriched_order_chunks(target_user_id)),
+                media_type="text/csv",
+                headers={"Content-Disposition": f"attachment; filename=\"{filename}\""}
+            )
+        if export_req.format == ExportFormat.excel:
+            spool = await spool_order_chunks(iter_enriched_order_chunks(target_user_id))
+            try:
+                data = await run_render(render_export_spool, export_req.format.value, spool.path)
+            finally:
+                spool.remove()
+            filename = f"orders_{datetime.utcnow().isoformat()}.xlsx"
+            return Response(
+                content=data,
+                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                headers={"Content-Disposition": f"attachment; filename=\"{filename}\""}
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El modo streaming sólo está disponible para CSV y Excel"
+        )
+
     # Obtener pedidos
-    if current_user.role == "admin":
-        if export_req.user_id:
-            # Pedidos de usuario específico
-            stmt = select(Order).where(Order.user_id == export_req.user_id).order_by(Order.created_at.desc())
-            orders = session.exec(stmt).all()
-        else:
-            orders = get_all_orders(session)
+    if target_user_id is None:
+        orders = await get_all_orders(session)
     else:
-        # Role cliente solo sus pedidos
-        orders = get_orders_by_user(session, current_user)
+        orders = await get_orders_by_user_id(session, target_user_id)
 
     # Enriquecer orders
     enriched = await enrich_orders_list(orders)
 
-    # Generar export según formato
+    # Generar export según formato (en el pool de procesos, fuera del event loop)
     if export_req.format == ExportFormat.csv:
-        data = export_orders_to_csv(enriched)
         media_type = "text/csv"
         filename = f"orders_{datetime.utcnow().isoformat()}.csv"
     elif export_req.format == ExportFormat.excel:
-        data = export_orders_to_excel(enriched)
         media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         filename = f"orders_{datetime.utcnow().isoformat()}.xlsx"
     elif export_req.format == ExportFormat.pdf:
-        data = export_orders_to_pdf(enriched)
         media_type = "application/pdf"
         filename = f"orders_{datetime.utcnow().isoformat()}.pdf"
     else:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Formato de exportación no válido")
+    data = await run_render(render_export, export_req.format.value, compact_orders(enriched))
 
     headers = {
         "Content-Disposition": f"attachment; filename=\"{filename}\""
     }
-    return Response(content=data, media_type=media_type, headers=headers)
\ No newline at end of file
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+# ------------------ Trabajos de exportación asíncronos ------------------
+
+def _job_read(job: dict) -> ExportJobRead:
+    return ExportJobRead(
+        id=job["id"],
+        status=job["status"],
+        format=job["format"],
+        progress=job["progress"],
+        total=job["total"],
+        created_at=job["created_at"],
+        finished_at=job.get("finished_at"),
+        error=job.get("error"),
+        download_url=f"{router.prefix}/jobs/{job['id']}/download" if job["status"] == "done" else None,
+    )
+
+async def _get_owned_job(job_id: str, current_user) -> dict:
+    try:
+        job = await export_jobs.get_job(job_id)
+    except RedisError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Servicio de trabajos no disponible")
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trabajo de exportación no encontrado")
+    if current_user.role != "admin" and job["owner_id"] != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acceso denegado")
+    return job
+
+@router.post("/jobs", response_model=ExportJobRead, status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(
+    export_req: ExportRequest,
+    current_user=Depends(get_current_active_user)
+):
+    """
+    Encola una exportación para generarla en segundo plano. Devuelve el trabajo
+    con su id; el estado se consulta en GET /exports/jobs/{id}.
+    """
+    target_user_id = _export_target_user_id(export_req, current_user)
+    try:
+        job = await export_jobs.create_job(current_user.id, export_req.format, target_user_id)
+    except RedisError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Servicio de trabajos no disponible")
+    return _job_read(job)
+
+@router.get("/jobs/{job_id}", response_model=ExportJobRead)
+async def get_export_job(job_id: str, current_user=Depends(get_current_active_user)):
+    """
+    Estado y progreso de un trabajo de exportación.
+    """
+    job = await _get_owned_job(job_id, current_user)
+    return _job_read(job)
+
+@router.get("/jobs/{job_id}/download", summary="Descargar exportación", responses={
+    200: {"content": {"application/octet-stream": {}}},
+})
+async def download_export_job(job_id: str, current_user=Depends(get_current_active_user)):
+    """
+    Descarga el fichero de un trabajo terminado.
+    """
+    job = await _get_owned_job(job_id, current_user)
+    if job["status"] != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="La exportación aún no ha terminado")
+    path = export_jobs.job_file_path(job)
+    if not os.path.exists(path):
+        host = job.get("host")
+        if host and host != export_jobs.EXPORT_JOB_HOST:
+            # Generado por otra instancia en un EXPORT_JOBS_DIR que no se comparte
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Fichero de exportación no disponible en esta instancia (generado en {host})"
+            )
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Fichero de exportación no disponible")
+    export_format = ExportFormat(job["format"])
+    filename = f"orders_{job['created_at']}.{export_jobs.EXTENSIONS[export_format]}"
+    return FileResponse(path, media_type=export_jobs.MEDIA_TYPES[export_format], filename=filename)
@@ -0,0 +1,21 @@
+# app/routers/metrics.py
+
+from fastapi import APIRouter, Depends
+
+from app import metrics
+from app.auth import get_current_active_admin
+from app.database import pool_status
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/", dependencies=[Depends(get_current_active_admin)])
+def read_metrics():
+    """
+    (Admin) Métricas del proceso: estado de los pools de conexiones, espera en
+    checkout, latencia de sentencias por tipo y contadores de errores.
+    """
+    return {
+        "pools": pool_status(),
+        "metrics": metrics.snapshot(),
+    }
@@ -1,70 +1,127 @@
-from fastapi import APIRouter, Depends, status
-from typing import List
-from sqlmodel import Session
-from app.schemas import OrderCreate, OrderRead, OrderUpdateState
-from app.crud_orders import create_order, get_order, get_orders_by_user, get_all_orders, update_order_state, enrich_order, enrich_orders_list
-from app.database import get_session
+from fastapi import APIRouter, Depends, File, Query, Response, UploadFile, status
+from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.schemas import (
+    OrderCreate, OrderRead, OrderPage, OrderUpdateState, OrderImportResult,
+    OrderBulkStateUpdate, OrderBulkStateResult,
+)
+from app.crud_orders import (
+    create_order, get_order, get_orders_page, update_order_state, bulk_update_order_state,
+    enrich_order_payload, enrich_orders_payload,
+)
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.database import get_async_session
 from app.auth import get_current_active_user, get_current_active_admin
+from app.order_import import ImportFormat, import_orders, IMPORT_BATCH_SIZE, IMPORT_MAX_BATCH_SIZE
 import asyncio
+import orjson
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# Las respuestas de pedidos se construyen ya como dicts (crud_orders.order_payload)
+# y se devuelven codificadas con orjson en un Response: FastAPI no vuelve a
+# validarlas contra el response_model (que queda sólo para la documentación).
+# Con 5k pedidos es entre 1.3x y 2x más rápido que devolverlas con response_model
+# (bench/order_serialization.py).
+
+def json_response(payload, status_code: int = status.HTTP_200_OK) -> Response:
+    return Response(content=orjson.dumps(payload), media_type="application/json", status_code=status_code)
+
 @router.post("/", response_model=OrderRead, status_code=status.HTTP_201_CREATED)
 async def create_new_order(
     order_in: OrderCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user=Depends(get_current_active_user)
 ):
     """
     Crea un pedido para el usuario autenticado.
     """
-    order = create_order(session, current_user, order_in)
-    enriched = await enrich_order(order)
-    return enriched
+    order = await create_order(session, current_user, order_in)
+    return json_response(await enrich_order_payload(order), status_code=status.HTTP_201_CREATED)
 
-@router.get("/", response_model=List[OrderRead])
+@router.get("/", response_model=OrderPage)
 async def list_user_orders(
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor/prev_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    expand: bool = Query(False, description="Incluir en cada item el producto completo de DummyJSON"),
+    session: AsyncSession = Depends(get_async_session),
     current_user=Depends(get_current_active_user)
 ):
     """
-    Lista todos los pedidos del usuario autenticado.
+    Lista paginada (por cursor) de los pedidos del usuario autenticado, del más reciente al más antiguo.
+    Los precios y títulos salen de la copia guardada en cada pedido; con expand=true
+    se añade el producto completo consultando DummyJSON.
     """
-    orders = get_orders_by_user(session, current_user)
-    enriched = await enrich_orders_list(orders)
-    return enriched
+    page = await get_orders_page(session, cursor, limit, user_id=current_user.id)
+    page["items"] = await enrich_orders_payload(page["items"], expand)
+    return json_response(page)
 
-@router.get("/all", response_model=List[OrderRead], dependencies=[Depends(get_current_active_admin)])
-async def list_all_orders(session: Session = Depends(get_session)):
+@router.get("/all", response_model=OrderPage, dependencies=[Depends(get_current_active_admin)])
+async def list_all_orders(
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor/prev_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    expand: bool = Query(False, description="Incluir en cada item el producto completo de DummyJSON"),
+    session: AsyncSession = Depends(get_async_session)
+):
     """
-    (Admin) Lista todos los pedidos de todos los usuarios.
+    (Admin) Lista paginada (por cursor) de los pedidos de todos los usuarios.
     """
-    orders = get_all_orders(session)
-    enriched = await enrich_orders_list(orders)
-    return enriched
+    page = await get_orders_page(session, cursor, limit)
+    page["items"] = await enrich_orders_payload(page["items"], expand)
+    return json_response(page)
+
+@router.post("/import", response_model=OrderImportResult, dependencies=[Depends(get_current_active_admin)])
+async def import_orders_file(
+    file: UploadFile = File(..., description="Pedidos en NDJSON (uno por línea) o CSV (una fila por item)"),
+    format: Optional[ImportFormat] = Query(None, description="Formato del fichero; si falta se deduce de la extensión"),
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=IMPORT_MAX_BATCH_SIZE),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    (Admin) Importación masiva de pedidos históricos. El fichero se valida en
+    streaming y se inserta por lotes con INSERT multi-fila (una transacción por
+    lote). Devuelve los pedidos insertados y rechazados y los errores por lote.
+    - NDJSON: {"user_id", "created_at", "state", "total_amount", "items": [{"product_id", "quantity", "unit_price", "title", "discount_percentage"}]}
+    - CSV: order_ref, user_id, created_at, state, product_id, quantity, unit_price, title, discount_percentage
+    """
+    if format is None:
+        format = ImportFormat.csv if (file.filename or "").lower().endswith(".csv") else ImportFormat.ndjson
+    return await import_orders(session, file.file, format, batch_size)
 
 @router.get("/{order_id}", response_model=OrderRead)
 async def get_single_order(
     order_id: int,
-    session: Session = Depends(get_session),
+    expand: bool = Query(False, description="Incluir en cada item el producto completo de DummyJSON"),
+    session: AsyncSession = Depends(get_async_session),
     current_user=Depends(get_current_active_user)
 ):
     """
     Obtiene un pedido por ID (si admin puede cualquiera, si cliente sólo el suyo).
     """
-    order = get_order(session, order_id, current_user)
-    enriched = await enrich_order(order)
-    return enriched
+    order = await get_order(session, order_id, current_user)
+    return json_response(await enrich_order_payload(order, expand))
 
 @router.patch("/{order_id}/state", response_model=OrderRead, dependencies=[Depends(get_current_active_admin)])
 async def change_order_state(
     order_id: int,
     state_in: OrderUpdateState,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     (Admin) Cambia el estado de un pedido.
     """
-    order = update_order_state(session, order_id, state_in)
-    enriched = await enrich_order(order)
-    return enriched
\ No newline at end of file
+    order = await update_order_state(session, order_id, state_in)
+    return json_response(await enrich_order_payload(order))
+
+@router.patch("/state", response_model=OrderBulkStateResult, dependencies=[Depends(get_current_active_admin)])
+async def change_orders_state(
+    bulk_in: OrderBulkStateUpdate,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    (Admin) Cambia el estado de muchos pedidos a la vez (por lista de ids y/o
+    filtro) con una sola sentencia. Devuelve sólo los ids actualizados, sin
+    enriquecer los pedidos.
+    """
+    updated_ids = await bulk_update_order_state(session, bulk_in)
+    return {"state": bulk_in.state, "updated": len(updated_ids), "ids": updated_ids}
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Header, Query, HTTPException, Response, status
 from typing import Optional
+from starlette.concurrency import run_in_threadpool
 from app.schemas import Product
 from app.utils import fetch_products_list
+from app.catalog import catalog_is_ready, search_catalog
+from app.product_cache import product_cache
+from app.response_cache import products_listing_cache, etag_matches
+from app.auth import get_current_active_admin
 import asyncio
 
 router = APIRouter(prefix="/products", tags=["products"])
@@ -13,17 +18,59 @@ async def list_products(
     sort: Optional[str] = Query(None, description="Campo para ordenar, p.ej. 'price' o '-price'"),
     category: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None, ge=0),
-    max_price: Optional[float] = Query(None, ge=0)
+    max_price: Optional[float] = Query(None, ge=0),
+    min_rating: Optional[float] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
-    Lista de productos con paginación, ordenación y filtros. Retorna:
+    Lista de productos con paginación, ordenación y filtros. Se sirve desde el
+    catálogo local; mientras no se haya sincronizado, se consulta DummyJSON. Retorna:
     {
       "products": [...],
       "total": int,
       "skip": int,
       "limit": int
     }
+    Las respuestas se cachean en Redis por combinación de parámetros e incluyen
+    ETag y Cache-Control; con If-None-Match coincidente se responde 304.
     """
+    params = {
+        "limit": limit, "skip": skip, "sort": sort, "category": category,
+        "min_price": min_price, "max_price": max_price, "min_rating": min_rating,
+    }
+    body, etag = await products_listing_cache.get_or_build(
+        params, lambda: _load_products_listing(**params)
+    )
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={products_listing_cache.ttl}",
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _load_products_listing(
+    limit: int,
+    skip: int,
+    sort: Optional[str],
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    min_rating: Optional[float],
+) -> dict:
+    if await run_in_threadpool(catalog_is_ready):
+        return await run_in_threadpool(
+            search_catalog,
+            limit=limit,
+            skip=skip,
+            sort=sort,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            min_rating=min_rating,
+        )
+
     filters = {}
     if category:
         filters["category"] = category
@@ -31,6 +78,25 @@ async def list_products(
         filters["minPrice"] = min_price
     if max_price is not None:
         filters["maxPrice"] = max_price
+    if min_rating is not None:
+        filters["minRating"] = min_rating
 
     result = await fetch_products_list(limit=limit, skip=skip, sort=sort, filter_params=filters)
-    return result
\ No newline at end of file
+    return result
+
+
+@router.delete("/cache", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_active_admin)])
+async def clear_products_cache():
+    """
+    (Admin) Vacía la caché de productos (memoria del worker y Redis) y la de listados.
+    """
+    await product_cache.clear()
+    await products_listing_cache.invalidate()
+
+
+@router.delete("/{product_id}/cache", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_active_admin)])
+async def evict_product_cache(product_id: int):
+    """
+    (Admin) Elimina un producto de la caché para forzar su recarga desde DummyJSON.
+    """
+    await product_cache.evict(product_id)
@@ -1,10 +1,11 @@
 # app/routers/users.py
 
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query
 from sqlmodel import Session
-from typing import List
+from typing import List, Optional
 
-from app.schemas import UserCreate, UserRead, UserUpdate
+from app.schemas import UserCreate, UserRead, UserUpdate, UserPage
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.crud_users import create_user, get_user, get_users, update_user, delete_user
 from app.database import get_session
 from app.auth import get_current_active_user, get_current_active_admin
@@ -35,17 +36,17 @@ def read_user(
     """
     return get_user(session, user_id)
 
-@router.get("/", response_model=List[UserRead])
+@router.get("/", response_model=UserPage)
 def list_users(
-    skip: int = 0,
-    limit: int = 50,
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor/prev_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     session: Session = Depends(get_session),
     current_admin=Depends(get_current_active_admin)
 ):
     """
-    Listar usuarios (sólo admin)
+    Listar usuarios paginados por cursor (sólo admin)
     """
-    return get_users(session, skip, limit)
+    return get_users(session, cursor, limit)
 
 @router.patch("/{user_id}", response_model=UserRead)
 def modify_user(
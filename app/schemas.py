@@ -1,9 +1,9 @@
 # app/schemas.py
 
 from typing import List, Optional
-from pydantic import BaseModel, EmailStr, constr
+from pydantic import BaseModel, EmailStr, Field, constr
 from enum import Enum
-from datetime import datetime
+from datetime import date, datetime
 
 # ----- Esquemas de Usuario -----
 
@@ -25,6 +25,11 @@ class UserRead(BaseModel):
     class Config:
         orm_mode = True
 
+class UserPage(BaseModel):
+    items: List[UserRead]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
 class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     full_name: Optional[str] = None
@@ -44,6 +49,7 @@ class TokenPayload(BaseModel):
     sub: str  # normalmente será el user_id en cadena
     exp: int
     role: str
+    jti: Optional[str] = None  # ausente en tokens emitidos antes de la revocación por jti
 
 class TokenRefresh(BaseModel):
     refresh_token: str
@@ -79,8 +85,12 @@ class OrderCreate(BaseModel):
 
 class OrderItemRead(BaseModel):
     id: int
-    product: Product
+    product_id: int
+    title: Optional[str] = None
+    unit_price: float
+    discount_percentage: Optional[float] = None
     quantity: int
+    product: Optional[Product] = None  # sólo con expand=true (producto completo de DummyJSON)
 
     class Config:
         orm_mode = True
@@ -96,9 +106,84 @@ class OrderRead(BaseModel):
     class Config:
         orm_mode = True
 
+class OrderPage(BaseModel):
+    items: List[OrderRead]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
 class OrderUpdateState(BaseModel):
     state: str  # valores permitidos: "pendiente", "procesado", "enviado"
 
+# Máximo de ids por petición de cambio masivo: cada id es un parámetro del
+# WHERE id IN (...) y asyncpg no admite más de 32767 por sentencia. Para lotes
+# mayores, usar los filtros o varias peticiones.
+ORDER_BULK_MAX_IDS = 10000
+
+class OrderBulkStateUpdate(BaseModel):
+    state: str  # nuevo estado
+    # Pedidos a cambiar: lista de ids y/o filtro (se combinan con AND; al menos uno es obligatorio)
+    ids: Optional[List[int]] = Field(None, max_items=ORDER_BULK_MAX_IDS)
+    user_id: Optional[int] = None
+    current_state: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class OrderBulkStateResult(BaseModel):
+    state: str
+    updated: int
+    ids: List[int]
+
+
+# ----- Esquemas de Importación masiva de pedidos -----
+
+class OrderItemImport(BaseModel):
+    product_id: int
+    quantity: int
+    title: Optional[str] = None
+    unit_price: Optional[float] = None
+    discount_percentage: Optional[float] = None
+
+class OrderImport(BaseModel):
+    user_id: int
+    created_at: Optional[datetime] = None  # si falta, fecha de la importación
+    state: str = "pendiente"
+    items: List[OrderItemImport]
+    total_amount: Optional[float] = None  # si falta, se calcula con unit_price de los items
+
+class OrderImportError(BaseModel):
+    batch: int
+    line: Optional[int] = None  # None = error del lote completo
+    error: str
+
+class OrderImportResult(BaseModel):
+    inserted: int
+    rejected: int
+    batches: int
+    errors: List[OrderImportError]
+
+
+# ----- Esquemas de Analítica -----
+
+class SalesTotals(BaseModel):
+    revenue: float
+    units: int
+    orders: int
+
+class SalesRow(SalesTotals):
+    key: str  # id de producto/usuario, categoría o inicio del periodo (YYYY-MM-DD)
+    label: Optional[str] = None  # título del producto o username
+
+class SalesReport(BaseModel):
+    group_by: str
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    state: Optional[str] = None
+    totals: SalesTotals
+    rows: List[SalesRow]
+
+class SalesRebuildResult(BaseModel):
+    rows: int  # filas diarias (día, usuario, estado) tras recalcular
+
 
 # ----- Esquemas de Exportación -----
 
@@ -109,4 +194,16 @@ class ExportFormat(str, Enum):
 
 class ExportRequest(BaseModel):
     format: ExportFormat
-    user_id: Optional[int] = None  # si admin: user_id opcional; si cliente, se ignora o valida internamente
\ No newline at end of file
+    user_id: Optional[int] = None  # si admin: user_id opcional; si cliente, se ignora o valida internamente
+    stream: bool = False  # CSV/Excel: lee y enriquece los pedidos por bloques (CSV en StreamingResponse)
+
+class ExportJobRead(BaseModel):
+    id: str
+    status: str  # queued, running, done, failed
+    format: ExportFormat
+    progress: int = 0  # pedidos procesados
+    total: Optional[int] = None  # pedidos a exportar (se conoce al empezar)
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    download_url: Optional[str] = None
@@ -1,30 +1,159 @@
 # app/utils.py
 
+import os
+import time
+import asyncio
+import logging
 import httpx
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Hashable, Iterable, Iterator, List, Optional, Tuple
 from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
 import csv
-import pandas as pd
+import pickle
+import tempfile
 from io import BytesIO, StringIO
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from reportlab.lib.pagesizes import LETTER
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
+from app import metrics
 from app.schemas import Product, OrderRead, OrderItemRead
+from app.product_cache import product_cache
+from app.response_cache import products_listing_cache
+from app.catalog import (
+    catalog_is_ready,
+    get_catalog_product,
+    upsert_catalog_page,
+    delete_missing_products,
+    try_acquire_sync_lock,
+    release_sync_lock,
+    mark_catalog_ready,
+)
 from datetime import datetime
 
 DUMMYJSON_BASE = "https://dummyjson.com"
 
+# Configuración del cliente HTTP compartido (pool keep-alive, HTTP/2 y timeouts por fase)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30.0))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "false").lower() in ("1", "true", "yes")
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5.0))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10.0))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", 10.0))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", 5.0))
+
+# Máximo de productos resueltos en paralelo al enriquecer pedidos
+PRODUCT_FETCH_CONCURRENCY = int(os.getenv("PRODUCT_FETCH_CONCURRENCY", 20))
+
+# Sincronización del catálogo local con DummyJSON
+CATALOG_SYNC_ENABLED = os.getenv("CATALOG_SYNC_ENABLED", "true").lower() in ("1", "true", "yes")
+CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", 3600))
+CATALOG_SYNC_PAGE_SIZE = int(os.getenv("CATALOG_SYNC_PAGE_SIZE", 100))
+
+logger = logging.getLogger("tienda_online")
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+# ---------------------------- Cliente HTTP compartido ----------------------------
+
+def _build_http_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=HTTP_CONNECT_TIMEOUT,
+        read=HTTP_READ_TIMEOUT,
+        write=HTTP_WRITE_TIMEOUT,
+        pool=HTTP_POOL_TIMEOUT,
+    )
+    # verify=False para saltarnos la validación SSL (igual que antes)
+    return httpx.AsyncClient(
+        base_url=DUMMYJSON_BASE,
+        verify=False,
+        http2=HTTP_HTTP2,
+        limits=limits,
+        timeout=timeout,
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP compartido del proceso. Se llama en el arranque de la app.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """
+    Cierra el cliente HTTP compartido (y sus conexiones keep-alive). Se llama al apagar la app.
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente compartido; si no se inicializó (scripts, tests), lo crea bajo demanda.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+# ---------------------------- Coalescencia de peticiones (single-flight) ----------------------------
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave: mientras una petición está
+    en vuelo, el resto de llamadores esperan su resultado en lugar de lanzar otra.
+    La petición corre en su propia task, así que la cancelación de un llamador
+    no afecta a los demás.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+
+_product_flight = SingleFlight()
+_products_list_flight = SingleFlight()
+
 
 # ---------------------------- Consumo de API externa DummyJSON ----------------------------
 
-async def fetch_product(product_id: int) -> Product:
+async def _fetch_product_upstream(product_id: int) -> Optional[Product]:
     """
-    Obtiene un producto por su ID desde DummyJSON, ignorando verificación SSL.
+    Pide un producto a DummyJSON. Devuelve None si no existe (404, cacheable);
+    cualquier otro error se propaga sin cachearse.
     """
-    url = f"{DUMMYJSON_BASE}/products/{product_id}"
-    # Creamos el cliente con verify=False para saltarnos la validación SSL
-    async with httpx.AsyncClient(verify=False) as client:
-        resp = await client.get(url)
+    client = get_http_client()
+    start = time.perf_counter()
+    resp = await client.get(f"/products/{product_id}")
+    metrics.histogram("upstream_request_seconds", endpoint="product").observe(time.perf_counter() - start)
+    if resp.status_code == 404:
+        return None
     if resp.status_code != 200:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -34,6 +163,59 @@ async def fetch_product(product_id: int) -> Product:
     return Product(**data)
 
 
+async def _fetch_product_coalesced(product_id: int) -> Optional[Product]:
+    return await _product_flight.do(product_id, lambda: _fetch_product_upstream(product_id))
+
+
+async def _load_product(product_id: int) -> Optional[Product]:
+    """
+    Carga un producto desde el catálogo local y, si aún no está sincronizado
+    o no contiene el producto, desde DummyJSON.
+    """
+    if await run_in_threadpool(catalog_is_ready):
+        product = await run_in_threadpool(get_catalog_product, product_id)
+        if product is not None:
+            return product
+    return await _fetch_product_coalesced(product_id)
+
+
+async def fetch_product(product_id: int) -> Product:
+    """
+    Obtiene un producto por su ID, pasando por la caché de productos
+    (memoria + Redis) y el catálogo local antes de llamar a DummyJSON.
+    Los fallos de caché concurrentes para el mismo producto comparten una única petición.
+    """
+    product = await product_cache.get(product_id, _load_product)
+    if product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Producto {product_id} no encontrado"
+        )
+    return product
+
+
+async def resolve_products(
+    product_ids: Iterable[int],
+    concurrency: int = PRODUCT_FETCH_CONCURRENCY
+) -> Dict[int, Product]:
+    """
+    Resuelve una sola vez cada product_id distinto, con concurrencia acotada.
+    Retorna un diccionario {product_id: Product}. Si algún producto no existe
+    se propaga el HTTPException 404 de fetch_product.
+    """
+    unique_ids = list(dict.fromkeys(product_ids))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _resolve(product_id: int) -> Product:
+        async with semaphore:
+            return await fetch_product(product_id)
+
+    start = time.perf_counter()
+    products = await asyncio.gather(*(_resolve(pid) for pid in unique_ids))
+    metrics.histogram("resolve_products_seconds").observe(time.perf_counter() - start)
+    return dict(zip(unique_ids, products))
+
+
 async def fetch_products_list(
     limit: int = 10,
     skip: int = 0,
@@ -45,7 +227,7 @@ async def fetch_products_list(
     filter_params puede incluir claves como 'category', 'minPrice', 'maxPrice', etc.
     Retorna el JSON completo que provee DummyJSON:
     { "products": [...], "total": int, "skip": int, "limit": int }
-    Ignora verificación SSL.
+    Las llamadas concurrentes con los mismos parámetros comparten una única petición.
     """
     params: Dict[str, Any] = {"limit": limit, "skip": skip}
     if sort:
@@ -54,9 +236,13 @@ async def fetch_products_list(
         for key, val in filter_params.items():
             params[key] = val
 
-    url = f"{DUMMYJSON_BASE}/products"
-    async with httpx.AsyncClient(verify=False) as client:
-        resp = await client.get(url, params=params)
+    key = tuple(sorted(params.items()))
+    return await _products_list_flight.do(key, lambda: _fetch_products_list_upstream(params))
+
+
+async def _fetch_products_list_upstream(params: Dict[str, Any]) -> Dict[str, Any]:
+    client = get_http_client()
+    resp = await client.get("/products", params=params)
     if resp.status_code != 200:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -65,96 +251,354 @@ async def fetch_products_list(
     return resp.json()  # contiene: products, total, skip, limit
 
 
+# ---------------------------- Sincronización del catálogo local ----------------------------
+
+async def sync_catalog() -> int:
+    """
+    Descarga el catálogo completo de DummyJSON por páginas y lo vuelca en la tabla
+    catalog_products (sólo se reescriben las filas que cambian). Los productos que
+    ya no existen en DummyJSON se eliminan. Devuelve el número de productos modificados.
+    Si otro worker está sincronizando, no hace nada.
+    """
+    lock = await run_in_threadpool(try_acquire_sync_lock)
+    if lock is None:
+        logger.info("Sincronización de catálogo en curso en otro worker; se omite.")
+        return 0
+    try:
+        synced_at = datetime.utcnow()
+        seen_ids: List[int] = []
+        changed_ids: List[int] = []
+        skip = 0
+        while True:
+            page = await _fetch_products_list_upstream({"limit": CATALOG_SYNC_PAGE_SIZE, "skip": skip})
+            products = page.get("products", [])
+            if not products:
+                break
+            seen_ids.extend(data["id"] for data in products)
+            changed_ids.extend(await run_in_threadpool(upsert_catalog_page, products, synced_at))
+            skip += len(products)
+            if skip >= page.get("total", 0):
+                break
+        deleted_ids = await run_in_threadpool(delete_missing_products, seen_ids)
+    finally:
+        await run_in_threadpool(release_sync_lock, lock)
+
+    for product_id in changed_ids + deleted_ids:
+        await product_cache.evict(product_id)
+    if changed_ids or deleted_ids:
+        await products_listing_cache.invalidate()
+    if seen_ids:
+        mark_catalog_ready()
+    logger.info(
+        f"Catálogo sincronizado: {len(seen_ids)} productos, "
+        f"{len(changed_ids)} modificados, {len(deleted_ids)} eliminados."
+    )
+    return len(changed_ids) + len(deleted_ids)
+
+
+async def catalog_sync_loop() -> None:
+    """
+    Tarea en segundo plano: sincroniza el catálogo al arrancar y cada CATALOG_SYNC_INTERVAL segundos.
+    """
+    while True:
+        try:
+            await sync_catalog()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error sincronizando el catálogo de productos")
+        await asyncio.sleep(CATALOG_SYNC_INTERVAL)
+
+
 # ---------------------------- Exportación a CSV / Excel / PDF ----------------------------
 
-def export_orders_to_csv(orders: List[OrderRead]) -> bytes:
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow([
-        "Order ID", "User ID", "Created At", "State",
-        "Product ID", "Title", "Quantity", "Price Unitario", "Subtotal"
-    ])
-    for order in orders:
-        for item in order.items:
-            precio_unitario = item.product.price
-            subtotal = precio_unitario * item.quantity
-            writer.writerow([
-                order.id,
-                order.user_id,
-                order.created_at.isoformat(),
-                order.state,
-                item.product.id,
-                item.product.title,
-                item.quantity,
-                f"{precio_unitario:.2f}",
-                f"{subtotal:.2f}"
-            ])
-    return output.getvalue().encode("utf-8")
+CSV_HEADER = [
+    "Order ID", "User ID", "Created At", "State",
+    "Product ID", "Title", "Quantity", "Price Unitario", "Subtotal"
+]
 
+EXCEL_DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"
+EXCEL_MONEY_FORMAT = "#,##0.00"
 
-def export_orders_to_excel(orders: List[OrderRead]) -> bytes:
-    rows = []
-    for order in orders:
-        for item in order.items:
-            precio_unitario = item.product.price
-            subtotal = precio_unitario * item.quantity
-            rows.append({
-                "Order ID": order.id,
-                "User ID": order.user_id,
-                "Created At": order.created_at,
-                "State": order.state,
-                "Product ID": item.product.id,
-                "Title": item.product.title,
-                "Quantity": item.quantity,
-                "Price Unitario": precio_unitario,
-                "Subtotal": subtotal
-            })
-    df = pd.DataFrame(rows)
+# Representación compacta (y serializable con pickle) de un pedido enriquecido,
+# que es lo que reciben los renderers, también cuando corren en otro proceso:
+# (order_id, user_id, created_at, state, [(product_id, title, quantity, unit_price), ...])
+CompactOrder = Tuple[int, int, datetime, str, List[Tuple[int, str, int, float]]]
+
+
+def compact_orders(orders: Iterable[OrderRead]) -> List[CompactOrder]:
+    return [
+        (
+            order.id,
+            order.user_id,
+            order.created_at,
+            order.state,
+            [(item.product_id, item.title, item.quantity, item.unit_price) for item in order.items],
+        )
+        for order in orders
+    ]
+
+
+# Todos los writers de exportación siguen la misma interfaz incremental:
+# se crean sobre un fichero/buffer de salida, reciben pedidos compactos por
+# bloques con add_rows() y se cierran con finish().
+
+
+class CsvOrdersWriter:
+    def __init__(self, output):
+        self.writer = csv.writer(output)
+        self.writer.writerow(CSV_HEADER)
+
+    def add_rows(self, orders: Iterable[CompactOrder]) -> None:
+        for order_id, user_id, created_at, state, items in orders:
+            for product_id, title, quantity, precio_unitario in items:
+                subtotal = precio_unitario * quantity
+                self.writer.writerow([
+                    order_id,
+                    user_id,
+                    created_at.isoformat(),
+                    state,
+                    product_id,
+                    title,
+                    quantity,
+                    f"{precio_unitario:.2f}",
+                    f"{subtotal:.2f}"
+                ])
+
+    def finish(self) -> None:
+        pass
+
+
+class ExcelOrdersWriter:
+    """
+    Libro en modo write-only: las filas se vuelcan a disco según se añaden,
+    así que la memoria no crece con el número de filas.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(title="Orders")
+        self.sheet.append(CSV_HEADER)
+
+    def add_rows(self, orders: Iterable[CompactOrder]) -> None:
+        sheet = self.sheet
+        for order_id, user_id, order_created_at, state, items in orders:
+            created_at = WriteOnlyCell(sheet, value=order_created_at)
+            created_at.number_format = EXCEL_DATETIME_FORMAT
+            for product_id, title, quantity, unit_price in items:
+                precio_unitario = WriteOnlyCell(sheet, value=unit_price)
+                precio_unitario.number_format = EXCEL_MONEY_FORMAT
+                subtotal = WriteOnlyCell(sheet, value=unit_price * quantity)
+                subtotal.number_format = EXCEL_MONEY_FORMAT
+                sheet.append([
+                    order_id,
+                    user_id,
+                    created_at,
+                    state,
+                    product_id,
+                    title,
+                    quantity,
+                    precio_unitario,
+                    subtotal
+                ])
+
+    def finish(self) -> None:
+        self.workbook.save(self.output)
+
+
+class PdfOrdersWriter:
+    """
+    Dibuja el reporte de pedidos en PDF de forma incremental.
+    """
+
+    def __init__(self, output):
+        self.canvas = canvas.Canvas(output, pagesize=LETTER)
+        self.width, self.height = LETTER
+        self.y = self.height - inch
+        self.canvas.setFont("Helvetica-Bold", 12)
+        self.canvas.drawString(inch, self.y, "Reporte de Pedidos")
+        self.canvas.setFont("Helvetica", 10)
+        self.y -= inch
+
+    def _new_page_if_needed(self) -> None:
+        if self.y < inch:
+            self.canvas.showPage()
+            self.y = self.height - inch
+
+    def add_rows(self, orders: Iterable[CompactOrder]) -> None:
+        c = self.canvas
+        for order_id, user_id, created_at, state, items in orders:
+            c.drawString(
+                inch,
+                self.y,
+                f"Pedido ID: {order_id} | Usuario: {user_id} | "
+                f"Fecha: {created_at.isoformat()} | Estado: {state}"
+            )
+            self.y -= 0.3 * inch
+            c.drawString(inch * 1.5, self.y, "Productos:")
+            self.y -= 0.3 * inch
+            total = 0.0
+            for product_id, title, quantity, precio_unitario in items:
+                subtotal = precio_unitario * quantity
+                total += subtotal
+                line = (
+                    f"- {title} (ID:{product_id}) x {quantity} "
+                    f"@ {precio_unitario:.2f}€ = {subtotal:.2f}€"
+                )
+                c.drawString(inch * 2, self.y, line)
+                self.y -= 0.3 * inch
+                self._new_page_if_needed()
+            c.drawString(inch * 1.5, self.y, f"Total Pedido: {total:.2f}€")
+            self.y -= inch
+            self._new_page_if_needed()
+
+    def finish(self) -> None:
+        self.canvas.showPage()
+        self.canvas.save()
+
+
+EXPORT_WRITERS = {
+    "csv": CsvOrdersWriter,
+    "excel": ExcelOrdersWriter,
+    "pdf": PdfOrdersWriter,
+}
+
+
+def open_export_output(export_format: str, path: str):
+    """
+    Abre el fichero de salida en el modo que necesita cada writer (texto para CSV, binario para el resto).
+    """
+    if export_format == "csv":
+        return open(path, "w", newline="", encoding="utf-8")
+    return open(path, "wb")
+
+
+# ---------------------------- Renderizado (ejecutable en el pool de procesos) ----------------------------
+# Estas funciones son de nivel de módulo y sólo reciben datos compactos para
+# poder enviarse a un ProcessPoolExecutor (ver app/render_pool.py).
+
+def _render_to_bytes(export_format: str, chunks: Iterable[List[CompactOrder]]) -> bytes:
+    if export_format == "csv":
+        output = StringIO()
+        writer = CsvOrdersWriter(output)
+        for orders in chunks:
+            writer.add_rows(orders)
+        return output.getvalue().encode("utf-8")
     buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Orders")
+    writer = EXPORT_WRITERS[export_format](buffer)
+    for orders in chunks:
+        writer.add_rows(orders)
+    writer.finish()
     return buffer.getvalue()
 
 
+def render_export(export_format: str, orders: List[CompactOrder]) -> bytes:
+    """
+    Renderiza en memoria los pedidos compactos al formato indicado y devuelve los bytes.
+    """
+    return _render_to_bytes(export_format, [orders])
+
+
+def render_export_file(export_format: str, spool_path: str, output_path: str) -> int:
+    """
+    Renderiza a output_path los bloques de pedidos guardados en un fichero spool
+    (ver ExportSpool), de uno en uno. Devuelve el número de pedidos escritos.
+    """
+    count = 0
+    with open_export_output(export_format, output_path) as output:
+        writer = EXPORT_WRITERS[export_format](output)
+        for orders in iter_spool(spool_path):
+            writer.add_rows(orders)
+            count += len(orders)
+        writer.finish()
+    return count
+
+
+def render_export_spool(export_format: str, spool_path: str) -> bytes:
+    """
+    Igual que render_export_file pero devolviendo los bytes (exportaciones síncronas por bloques).
+    """
+    return _render_to_bytes(export_format, iter_spool(spool_path))
+
+
+class ExportSpool:
+    """
+    Fichero temporal donde se van guardando (pickle) los bloques de pedidos
+    compactos, para que el proceso que renderiza los lea de uno en uno sin
+    que ninguno de los dos procesos tenga toda la exportación en memoria.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        fd, self.path = tempfile.mkstemp(suffix=".spool", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+        self.count = 0
+
+    def write(self, orders: List[CompactOrder]) -> None:
+        pickle.dump(orders, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.count += len(orders)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def remove(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def iter_spool(spool_path: str) -> Iterator[List[CompactOrder]]:
+    with open(spool_path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+# ---------------------------- Exportación (API) ----------------------------
+
+def export_orders_to_csv(orders: List[OrderRead]) -> bytes:
+    return render_export("csv", compact_orders(orders))
+
+
+def export_orders_to_excel(orders: List[OrderRead]) -> bytes:
+    return render_export("excel", compact_orders(orders))
+
+
 def export_orders_to_pdf(orders: List[OrderRead]) -> bytes:
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=LETTER)
-    width, height = LETTER
-    y = height - inch
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(inch, y, "Reporte de Pedidos")
-    c.setFont("Helvetica", 10)
-    y -= inch
-
-    for order in orders:
-        c.drawString(
-            inch,
-            y,
-            f"Pedido ID: {order.id} | Usuario: {order.user_id} | "
-            f"Fecha: {order.created_at.isoformat()} | Estado: {order.state}"
-        )
-        y -= 0.3 * inch
-        c.drawString(inch * 1.5, y, "Productos:")
-        y -= 0.3 * inch
-        for item in order.items:
-            precio_unitario = item.product.price
-            subtotal = precio_unitario * item.quantity
-            line = (
-                f"- {item.product.title} (ID:{item.product.id}) x {item.quantity} "
-                f"@ {precio_unitario:.2f}€ = {subtotal:.2f}€"
-            )
-            c.drawString(inch * 2, y, line)
-            y -= 0.3 * inch
-            if y < inch:
-                c.showPage()
-                y = height - inch
-        total = sum(item.product.price * item.quantity for item in order.items)
-        c.drawString(inch * 1.5, y, f"Total Pedido: {total:.2f}€")
-        y -= inch
-        if y < inch:
-            c.showPage()
-            y = height - inch
-
-    c.showPage()
-    c.save()
-    return buffer.getvalue()
\ No newline at end of file
+    return render_export("pdf", compact_orders(orders))
+
+
+async def stream_orders_csv(chunks: AsyncIterator[List[OrderRead]]) -> AsyncIterator[bytes]:
+    """
+    Genera el CSV de forma incremental: primero la cabecera y después un bloque de
+    bytes por cada bloque de pedidos enriquecidos. La memoria queda acotada por el
+    tamaño de bloque, no por el total de pedidos.
+    """
+    output = StringIO()
+    writer = CsvOrdersWriter(output)
+    yield output.getvalue().encode("utf-8")
+    async for orders in chunks:
+        output.seek(0)
+        output.truncate(0)
+        writer.add_rows(compact_orders(orders))
+        yield output.getvalue().encode("utf-8")
+
+
+async def spool_order_chunks(chunks: AsyncIterator[List[OrderRead]], directory: Optional[str] = None) -> ExportSpool:
+    """
+    Vuelca a un ExportSpool los bloques de pedidos enriquecidos (en forma compacta).
+    """
+    spool = ExportSpool(directory)
+    try:
+        async for orders in chunks:
+            spool.write(compact_orders(orders))
+    except BaseException:
+        spool.remove()
+        raise
+    spool.close()
+    return spool
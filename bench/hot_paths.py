@@ -0,0 +1,388 @@
+# bench/hot_paths.py
+"""
+Benchmark sin red de los caminos críticos de la API:
+- enrich_orders_list (con snapshot y con expand, que consulta DummyJSON)
+- GET /orders/all
+- export_orders_to_csv / export_orders_to_excel / export_orders_to_pdf
+- POST /auth/token
+- get_current_user (con y sin la caché de principales)
+
+Siembra usuarios, pedidos e items en una base de datos propia (SQLite temporal
+por defecto) y sirve DummyJSON con un httpx.MockTransport con latencia
+configurable, así que no necesita red, Postgres ni Redis. La salida es JSON:
+por caso, iteraciones, p50/p99/media en ms, rendimiento (operaciones o
+pedidos por segundo) y pico de memoria asignada por una llamada (tracemalloc,
+en una ejecución aparte de las medidas); al final, el pico de memoria
+residente de todo el proceso, que no se puede atribuir a un caso concreto.
+
+Uso (desde la raíz del repositorio):
+    python -m bench.hot_paths --users 50 --orders 2000 --items 3 --latency-ms 20 --repeat 20
+    python -m bench.hot_paths --only orders_all,auth_token --output resultados.json
+
+Por defecto usa aiosqlite, incluido en requirements-dev.txt (no lo necesita la app):
+    pip install -r requirements-dev.txt
+
+Con --database-url se puede usar otro motor (p. ej. Postgres con asyncpg); la
+base de datos debe ser desechable: sus tablas se borran y se vuelven a crear.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import utils
+from app.auth import create_access_token, get_current_user, get_password_hash, BCRYPT_ROUNDS
+from app.crud_orders import enrich_orders_list, get_all_orders
+from app.database import get_async_session
+from app.models import Order, OrderItem, Role, User
+from app.principal_cache import principal_cache
+from app.product_cache import product_cache
+from app.revocation import revoked_tokens
+from app.routers import auth as auth_router, orders as orders_router
+
+BENCH_PASSWORD = "bench-password"
+
+CASES = [
+    "enrich_orders_list",
+    "enrich_orders_list_expand",
+    "orders_all",
+    "export_csv",
+    "export_excel",
+    "export_pdf",
+    "auth_token",
+    "get_current_user",
+    "get_current_user_cached",
+]
+
+
+# ------------------------------------------------------
+# DummyJSON simulado
+# ------------------------------------------------------
+def fake_product(product_id: int) -> Dict[str, Any]:
+    return {
+        "id": product_id,
+        "title": f"Producto {product_id}",
+        "description": f"Descripción del producto {product_id}",
+        "price": round(5 + (product_id % 50) * 1.25, 2),
+        "discountPercentage": float(product_id % 20),
+        "rating": round(3 + (product_id % 20) / 10, 1),
+        "stock": 100,
+        "brand": f"Marca {product_id % 7}",
+        "category": f"categoria-{product_id % 10}",
+        "thumbnail": f"https://cdn.example.com/{product_id}.jpg",
+        "images": [f"https://cdn.example.com/{product_id}-1.jpg"],
+    }
+
+def dummyjson_transport(latency: float, products: int, calls: Dict[str, int]) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls["requests"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        parts = request.url.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "products" and parts[1].isdigit():
+            product_id = int(parts[1])
+            if 1 <= product_id <= products:
+                return httpx.Response(200, json=fake_product(product_id))
+            return httpx.Response(404, json={"message": f"Product with id '{product_id}' not found"})
+        return httpx.Response(404, json={"message": "not found"})
+    return httpx.MockTransport(handler)
+
+
+# ------------------------------------------------------
+# Base de datos y datos de prueba
+# ------------------------------------------------------
+async def seed(engine, users: int, orders: int, items: int, products: int, legacy_ratio: float) -> None:
+    """
+    Crea las tablas y siembra users usuarios (el primero admin), orders pedidos
+    repartidos entre ellos e items por pedido. Una fracción legacy_ratio de los
+    pedidos no tiene snapshot del producto (como los anteriores a guardarlo), así
+    que enriquecerlos requiere DummyJSON.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    hashed = get_password_hash(BENCH_PASSWORD)  # un solo hash para todos: sembrar no es lo que se mide
+    base = datetime(2024, 1, 1)
+    legacy_every = round(1 / legacy_ratio) if legacy_ratio > 0 else 0
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {
+                "id": user_id,
+                "username": f"user{user_id}",
+                "email": f"user{user_id}@example.com",
+                "full_name": f"Usuario {user_id}",
+                "hashed_password": hashed,
+                "role": Role.admin if user_id == 1 else Role.cliente,
+                "is_active": True,
+                "created_at": base,
+            }
+            for user_id in range(1, users + 1)
+        ])
+        order_rows, item_rows = [], []
+        for order_id in range(1, orders + 1):
+            legacy = legacy_every and order_id % legacy_every == 0
+            total = 0.0
+            for n in range(items):
+                product = fake_product((order_id * 7 + n * 13) % products + 1)
+                quantity = n % 3 + 1
+                total += product["price"] * quantity
+                item_rows.append({
+                    "order_id": order_id,
+                    "product_id": product["id"],
+                    "quantity": quantity,
+                    "title": None if legacy else product["title"],
+                    "unit_price": None if legacy else product["price"],
+                    "discount_percentage": None if legacy else product["discountPercentage"],
+                })
+            order_rows.append({
+                "id": order_id,
+                "user_id": order_id % users + 1,
+                "created_at": base + timedelta(minutes=order_id),
+                "state": ("pendiente", "procesado", "enviado")[order_id % 3],
+                "total_amount": None if legacy else round(total, 2),
+            })
+        await conn.execute(insert(Order), order_rows)
+        await conn.execute(insert(OrderItem), item_rows)
+
+
+# ------------------------------------------------------
+# Medición
+# ------------------------------------------------------
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KiB y macOS en bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+async def peak_alloc_mb(
+    func: Callable[[], Awaitable[Any]],
+    before: Optional[Callable[[], Awaitable[None]]] = None,
+) -> float:
+    """
+    Pico de memoria asignada por Python durante una llamada a func. Se mide con
+    tracemalloc en una llamada aparte porque ralentiza la ejecución y falsearía
+    los tiempos. No incluye lo que reservan las librerías en C fuera del
+    asignador de Python.
+    """
+    if before is not None:
+        await before()
+    tracemalloc.start()
+    try:
+        await func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / (1024 * 1024), 1)
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+async def measure(
+    repeat: int,
+    func: Callable[[], Awaitable[Any]],
+    units: int = 1,
+    unit: str = "ops",
+    before: Optional[Callable[[], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Ejecuta func una vez de calentamiento, repeat veces medidas y una más con
+    tracemalloc para el pico de memoria; before (fuera de la medición) prepara
+    cada iteración, p. ej. vaciando una caché.
+    units es el número de elementos que procesa cada llamada (pedidos, peticiones).
+    """
+    timings = []
+    for iteration in range(repeat + 1):
+        if before is not None:
+            await before()
+        start = time.perf_counter()
+        await func()
+        elapsed = time.perf_counter() - start
+        if iteration:
+            timings.append(elapsed)
+    total = sum(timings)
+    return {
+        "iterations": repeat,
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "mean_ms": round(total / repeat * 1000, 3),
+        "throughput": round(units * repeat / total, 2) if total else None,
+        "throughput_unit": f"{unit}/s",
+        "peak_alloc_mb": await peak_alloc_mb(func, before),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases = CASES if not args.only else [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = sorted(set(cases) - set(CASES))
+    if unknown:
+        raise SystemExit(f"Casos desconocidos: {', '.join(unknown)} (disponibles: {', '.join(CASES)})")
+
+    database_file = None
+    database_url = args.database_url
+    if not database_url:
+        database_file = tempfile.NamedTemporaryFile(prefix="bench-", suffix=".db", delete=False).name
+        database_url = f"sqlite+aiosqlite:///{database_file}"
+    engine = create_async_engine(database_url)
+
+    # Sin red: DummyJSON simulado, catálogo local desactivado (las lecturas de
+    # productos pasan por el cliente HTTP), caché de productos sólo en memoria y
+    # lista de revocación local marcada como sincronizada (sin Redis).
+    upstream_calls = {"requests": 0}
+    utils._http_client = httpx.AsyncClient(
+        base_url=utils.DUMMYJSON_BASE,
+        transport=dummyjson_transport(args.latency_ms / 1000, args.products, upstream_calls),
+    )
+    utils.catalog_is_ready = lambda: False
+    product_cache.use_redis = False
+    revoked_tokens.replace({})
+    revoked_tokens.synced = True
+
+    results: Dict[str, Any] = {}
+    try:
+        seed_start = time.perf_counter()
+        await seed(engine, args.users, args.orders, args.items, args.products, args.legacy_ratio)
+        seed_seconds = time.perf_counter() - seed_start
+
+        async def bench_session():
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                yield session
+
+        app = FastAPI()
+        app.include_router(auth_router.router)
+        app.include_router(orders_router.router)
+        app.dependency_overrides[get_async_session] = bench_session
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+        admin_token = create_access_token(subject="1", role=Role.admin.value)
+        headers = {"Authorization": f"Bearer {admin_token}"}
+
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            orders = await get_all_orders(session)
+        read_orders = await enrich_orders_list(orders)
+
+        async def clear_product_cache():
+            await product_cache.clear()
+
+        async def clear_principal_cache():
+            principal_cache.clear()
+
+        async def enrich():
+            await enrich_orders_list(orders)
+
+        async def enrich_expand():
+            await enrich_orders_list(orders, expand=True)
+
+        async def orders_all():
+            response = await client.get("/orders/all", params={"limit": args.page_size}, headers=headers)
+            response.raise_for_status()
+
+        def renderer(func):
+            async def render():
+                func(read_orders)
+            return render
+
+        async def login():
+            response = await client.post(
+                "/auth/token", data={"username": "user2" if args.users > 1 else "user1", "password": BENCH_PASSWORD}
+            )
+            response.raise_for_status()
+
+        async def current_user():
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                await get_current_user(session, admin_token)
+
+        plan = {
+            # Pedidos con snapshot: sólo los antiguos (legacy_ratio) consultan DummyJSON
+            "enrich_orders_list": lambda: measure(args.repeat, enrich, len(orders), "orders", clear_product_cache),
+            "enrich_orders_list_expand": lambda: measure(args.repeat, enrich_expand, len(orders), "orders", clear_product_cache),
+            "orders_all": lambda: measure(args.repeat, orders_all, 1, "requests", clear_product_cache),
+            "export_csv": lambda: measure(args.repeat, renderer(utils.export_orders_to_csv), len(read_orders), "orders"),
+            "export_excel": lambda: measure(args.repeat, renderer(utils.export_orders_to_excel), len(read_orders), "orders"),
+            "export_pdf": lambda: measure(args.repeat, renderer(utils.export_orders_to_pdf), len(read_orders), "orders"),
+            "auth_token": lambda: measure(args.auth_repeat, login, 1, "requests"),
+            "get_current_user": lambda: measure(args.repeat, current_user, 1, "ops", clear_principal_cache),
+            "get_current_user_cached": lambda: measure(args.repeat, current_user, 1, "ops"),
+        }
+        for name in cases:
+            # Peticiones a DummyJSON simulado durante el caso (incluidas las
+            # iteraciones de calentamiento y de memoria)
+            calls_before = upstream_calls["requests"]
+            results[name] = await plan[name]()
+            results[name]["upstream_requests"] = upstream_calls["requests"] - calls_before
+
+        await client.aclose()
+    finally:
+        await utils.close_http_client()
+        await engine.dispose()
+        if database_file:
+            os.unlink(database_file)
+
+    return {
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "params": {
+            "users": args.users,
+            "orders": args.orders,
+            "items_per_order": args.items,
+            "products": args.products,
+            "legacy_ratio": args.legacy_ratio,
+            "latency_ms": args.latency_ms,
+            "page_size": args.page_size,
+            "repeat": args.repeat,
+            "auth_repeat": args.auth_repeat,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=3, help="Items por pedido")
+    parser.add_argument("--products", type=int, default=100, help="Productos distintos en DummyJSON simulado")
+    parser.add_argument("--legacy-ratio", type=float, default=0.1, help="Fracción de pedidos sin snapshot del producto")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latencia de cada respuesta de DummyJSON simulado")
+    parser.add_argument("--page-size", type=int, default=100, help="limit de GET /orders/all")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--auth-repeat", type=int, default=10, help="Iteraciones de /auth/token (bcrypt es lento a propósito)")
+    parser.add_argument("--only", help=f"Casos separados por comas ({', '.join(CASES)})")
+    parser.add_argument("--database-url", help="URL async de SQLAlchemy; por defecto, SQLite temporal (aiosqlite)")
+    parser.add_argument("--output", help="Fichero donde escribir el JSON además de mostrarlo")
+    args = parser.parse_args()
+    if args.users < 1 or args.orders < 1 or args.items < 1 or args.products < 1 or args.repeat < 1 or args.auth_repeat < 1:
+        parser.error("--users, --orders, --items, --products, --repeat y --auth-repeat deben ser >= 1")
+    if not 0 <= args.legacy_ratio <= 1:
+        parser.error("--legacy-ratio debe estar entre 0 y 1")
+
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# bench/order_serialization.py
+"""
+Benchmark de serialización de una respuesta grande de /orders (5k pedidos por
+defecto), medida a través de la pila ASGI completa con httpx.ASGITransport
+(enrutado, dependencias, serialización y envío del cuerpo). Los pedidos ya
+están cargados en memoria, así que no interviene la base de datos: la
+diferencia entre casos es sólo el coste de convertir la página en bytes.
+
+Casos (todos devuelven el mismo JSON):
+- response_model_models: lo que hacían los endpoints antes; se devuelven
+  modelos OrderRead y FastAPI los valida y serializa con response_model=OrderPage.
+- response_model_payloads: se devuelven los dicts de crud_orders.order_payload
+  con response_model=OrderPage (serialización nativa de FastAPI/Pydantic).
+- orjson_bytes: los mismos dicts codificados con orjson en un Response plano
+  (lo que hace app/routers/orders.py).
+
+Uso (desde la raíz del repositorio):
+    python -m bench.order_serialization --orders 5000 --items 3 --repeat 10
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+
+from app.models import Order, OrderItem
+from app.schemas import OrderPage
+from app.crud_orders import build_order_read, order_payload
+from app.routers.orders import json_response
+
+
+def make_orders(count: int, items_per_order: int):
+    base = datetime(2024, 1, 1)
+    orders = []
+    for order_id in range(1, count + 1):
+        order = Order(
+            id=order_id,
+            user_id=order_id % 100 + 1,
+            created_at=base + timedelta(minutes=order_id),
+            state="pendiente",
+            total_amount=0.0,
+        )
+        order.items = [
+            OrderItem(
+                id=order_id * items_per_order + n,
+                order_id=order_id,
+                product_id=n + 1,
+                quantity=n + 1,
+                title=f"Producto {n + 1}",
+                unit_price=9.99 + n,
+                discount_percentage=5.0,
+            )
+            for n in range(items_per_order)
+        ]
+        order.total_amount = sum(item.unit_price * item.quantity for item in order.items)
+        orders.append(order)
+    return orders
+
+
+def make_app(orders) -> FastAPI:
+    """
+    App con un endpoint por caso. Cada petición construye la página desde los
+    objetos Order, como hacen los endpoints reales tras la consulta.
+    """
+    app = FastAPI()
+
+    def page(items):
+        return {"items": items, "next_cursor": None, "prev_cursor": None}
+
+    @app.get("/response_model_models", response_model=OrderPage)
+    async def response_model_models():
+        return page([build_order_read(order) for order in orders])
+
+    @app.get("/response_model_payloads", response_model=OrderPage)
+    async def response_model_payloads():
+        return page([order_payload(order) for order in orders])
+
+    @app.get("/orjson_bytes", response_model=OrderPage)
+    async def orjson_bytes():
+        return json_response(page([order_payload(order) for order in orders]))
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, repeat: int) -> dict:
+    await client.get(path)  # calentamiento
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return {
+        "min_ms": round(min(timings) * 1000, 2),
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "bytes": len(response.content),
+        "body": response.json(),
+    }
+
+
+async def run(orders, repeat: int) -> dict:
+    transport = httpx.ASGITransport(app=make_app(orders))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        for case in ("response_model_models", "response_model_payloads", "orjson_bytes"):
+            results[case] = await measure(client, f"/{case}", repeat)
+    bodies = [result.pop("body") for result in results.values()]
+    assert all(body == bodies[0] for body in bodies), "Los casos no devuelven el mismo JSON"
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(make_orders(args.orders, args.items), args.repeat))
+    baseline = results["response_model_models"]["median_ms"]
+    for result in results.values():
+        result["speedup"] = round(baseline / result["median_ms"], 2) if result["median_ms"] else None
+    print(json.dumps({
+        "orders": args.orders,
+        "items_per_order": args.items,
+        "repeat": args.repeat,
+        **results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# tests/seed.py
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlmodel import SQLModel
+
+from app.models import Order, OrderItem, Role, User
+
+
+async def seed_orders(engine, orders: int, users: int = 10, items: int = 3) -> None:
+    """
+    Recrea las tablas y siembra users usuarios y orders pedidos con items
+    (con snapshot del producto) repartidos entre ellos.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    base = datetime(2024, 1, 1)
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {
+                "id": user_id,
+                "username": f"user{user_id}",
+                "email": f"user{user_id}@example.com",
+                "hashed_password": "x",
+                "role": Role.admin if user_id == 1 else Role.cliente,
+                "is_active": True,
+                "created_at": base,
+            }
+            for user_id in range(1, users + 1)
+        ])
+        await conn.execute(insert(Order), [
+            {
+                "id": order_id,
+                "user_id": order_id % users + 1,
+                "created_at": base + timedelta(minutes=order_id),
+                "state": "pendiente",
+                "total_amount": 10.0 * items,
+            }
+            for order_id in range(1, orders + 1)
+        ])
+        await conn.execute(insert(OrderItem), [
+            {
+                "order_id": order_id,
+                "product_id": (order_id + n) % 100 + 1,
+                "quantity": 1,
+                "title": f"Producto {(order_id + n) % 100 + 1}",
+                "unit_price": 10.0,
+                "discount_percentage": 0.0,
+            }
+            for order_id in range(1, orders + 1)
+            for n in range(items)
+        ])
@@ -0,0 +1,31 @@
+# tests/test_export_jobs.py
+"""
+Arranque de los workers de exportación sin Redis: la API debe arrancar y los
+workers quedan reintentando hasta que Redis vuelva.
+"""
+
+import asyncio
+
+from redis.asyncio import Redis
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+
+from app import export_jobs
+
+
+def test_start_workers_without_redis(monkeypatch, tmp_path):
+    # Puerto sin servidor: cada llamada falla con ConnectionError (un RedisError)
+    client = Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.2, retry=Retry(NoBackoff(), 0))
+    monkeypatch.setattr(export_jobs, "get_redis", lambda: client)
+    monkeypatch.setattr(export_jobs, "EXPORT_JOBS_DIR", str(tmp_path / "exports"))
+
+    async def main():
+        await export_jobs.start_workers(1)
+        try:
+            await asyncio.sleep(0.1)
+            assert all(not task.done() for task in export_jobs._workers)
+        finally:
+            await export_jobs.stop_workers()
+        assert not export_jobs._workers
+
+    asyncio.run(main())
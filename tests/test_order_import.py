@@ -0,0 +1,58 @@
+# tests/test_order_import.py
+"""
+Lectura de ficheros de importación tal como llegan en UploadFile.file: un
+tempfile.SpooledTemporaryFile binario (sin readable() antes de Python 3.11).
+"""
+
+import tempfile
+
+from app.order_import import ImportFormat, parse_import
+from app.schemas import OrderImport
+
+
+def _upload(content: bytes) -> tempfile.SpooledTemporaryFile:
+    file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    file.write(content)
+    file.seek(0)
+    return file
+
+
+def test_parse_ndjson_from_spooled_file():
+    content = (
+        '﻿{"user_id": 1, "items": [{"product_id": 3, "quantity": 2, "unit_price": 9.5, "title": "Café"}]}\n'
+        "\n"
+        "no es json\n"
+        '{"user_id": 2, "items": []}\n'
+    ).encode("utf-8")
+    parsed = list(parse_import(_upload(content), ImportFormat.ndjson))
+
+    assert [line for line, _ in parsed] == [1, 3, 4]
+    order = parsed[0][1]
+    assert isinstance(order, OrderImport)
+    assert order.user_id == 1 and order.items[0].title == "Café" and order.items[0].quantity == 2
+    assert parsed[1][1].startswith("JSON inválido")
+    assert parsed[2][1] == "El pedido no tiene items"
+
+
+def test_parse_csv_from_spooled_file():
+    content = (
+        "﻿order_ref,user_id,created_at,state,product_id,quantity,unit_price,title,discount_percentage\r\n"
+        "a,1,2024-01-01T10:00:00,enviado,3,2,9.5,\"Café, molido\",\r\n"
+        "a,1,2024-01-01T10:00:00,enviado,4,1,5,\"Taza\ngrande\",10\r\n"
+        "b,2,,,5,0,1,Vaso,\r\n"
+    ).encode("utf-8")
+    parsed = list(parse_import(_upload(content), ImportFormat.csv))
+
+    assert len(parsed) == 2
+    line, order = parsed[0]
+    assert line == 2
+    assert isinstance(order, OrderImport)
+    assert order.state == "enviado"
+    assert [item.title for item in order.items] == ["Café, molido", "Taza\ngrande"]
+    assert order.items[1].discount_percentage == 10
+    assert parsed[1][1] == "La cantidad de cada item debe ser mayor que 0"
+
+
+def test_parse_csv_reports_missing_columns():
+    parsed = list(parse_import(_upload(b"user_id,product_id\n1,2\n"), ImportFormat.csv))
+    assert parsed == [(1, "Faltan columnas en la cabecera: order_ref, quantity")]
@@ -0,0 +1,64 @@
+# tests/test_order_queries.py
+"""
+Número de sentencias SQL por listado de pedidos: los items se cargan con un
+único SELECT ... WHERE order_id IN (...) (ORDER_ITEMS_LOADER), así que el
+número no depende de cuántos pedidos haya (sin N+1).
+"""
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.crud_orders import get_all_orders, get_orders_page
+from tests.seed import seed_orders
+
+pytest.importorskip("aiosqlite")
+
+
+async def _count_statements(orders: int, query) -> int:
+    database_file = tempfile.NamedTemporaryFile(prefix="test-", suffix=".db", delete=False).name
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_file}")
+    try:
+        await seed_orders(engine, orders)
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            result = await query(session)
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+        assert result
+        return len(statements)
+    finally:
+        await engine.dispose()
+        os.unlink(database_file)
+
+
+# selectinload agrupa los ids de 500 en 500: con más pedidos por consulta habría
+# un SELECT de items por cada grupo, así que los tamaños se quedan por debajo.
+@pytest.mark.parametrize("orders", [5, 50, 400])
+def test_get_orders_page_uses_two_statements(orders):
+    async def page(session):
+        return (await get_orders_page(session, limit=100))["items"]
+
+    assert asyncio.run(_count_statements(orders, page)) == 2
+
+
+@pytest.mark.parametrize("orders", [5, 50, 400])
+def test_get_orders_page_of_user_uses_two_statements(orders):
+    async def page(session):
+        return (await get_orders_page(session, limit=100, user_id=2))["items"]
+
+    assert asyncio.run(_count_statements(orders, page)) == 2
+
+
+@pytest.mark.parametrize("orders", [5, 50, 400])
+def test_get_all_orders_uses_two_statements(orders):
+    assert asyncio.run(_count_statements(orders, get_all_orders)) == 2